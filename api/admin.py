@@ -92,7 +92,7 @@ class SteeringAxleModelAdmin(admin.ModelAdmin):
 
 @admin.register(MaintenanceType)
 class MaintenanceTypeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'description')
+    list_display = ('name', 'interval_hours', 'description')
     search_fields = ('name',)
 
 
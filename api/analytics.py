@@ -0,0 +1,112 @@
+import datetime
+import hashlib
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Max, Min, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncMonth
+
+from .changes import latest_version
+from .models import Claim
+from .scoping import scope_queryset
+
+CACHE_TIMEOUT = 60 * 60
+
+# Grouping -> expression over Claim
+GROUPS = {
+    'failure_node': F('failure_node'),
+    'model': F('machine__model'),
+    'engine_model': F('machine__engine_model'),
+    'transmission_model': F('machine__transmission_model'),
+    'service_company': F('service_company'),
+    'month': TruncMonth('failure_date'),
+}
+
+DOWNTIME = ExpressionWrapper(F('recovery_date') - F('failure_date'), output_field=DurationField())
+
+
+def _days(value):
+    if value is None:
+        return None
+    if isinstance(value, datetime.timedelta):
+        return round(value.total_seconds() / 86400, 2)
+    return round(value, 2)
+
+
+def _key(value):
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m')
+    return value
+
+
+def _medians(claims):
+    # Only the one or two middle rows of every group leave the database.
+    rows = claims.annotate(
+        position=Window(RowNumber(), partition_by=[F('group')], order_by=[DOWNTIME.asc(), F('id').asc()]),
+        size=Window(Count('id'), partition_by=[F('group')]),
+    ).filter(
+        Q(position=(F('size') + 1) / 2) | Q(position=(F('size') + 2) / 2)
+    ).values_list('group', 'downtime')
+
+    middles = defaultdict(list)
+    for group, downtime in rows:
+        middles[group].append(downtime)
+    return {group: sum(values, datetime.timedelta()) / len(values) for group, values in middles.items()}
+
+
+def _mtbf(claims):
+    # Mean of consecutive operating time deltas of a machine is (last - first) / (failures - 1);
+    # a group's MTBF pools those spans and intervals over its machines.
+    spans, intervals = defaultdict(int), defaultdict(int)
+    for group, first, last, failures in claims.values('group', 'machine').annotate(
+            first=Min('operating_time'), last=Max('operating_time'), failures=Count('id')
+    ).values_list('group', 'first', 'last', 'failures'):
+        spans[group] += last - first
+        intervals[group] += failures - 1
+    return {group: round(spans[group] / intervals[group], 1) for group in spans if intervals[group]}
+
+
+def compute(queryset, group_by):
+    claims = queryset.annotate(group=GROUPS[group_by], downtime=DOWNTIME)
+
+    totals = claims.values('group').annotate(
+        failures=Count('id'),
+        machines=Count('machine', distinct=True),
+        downtime_mean=Avg('downtime'),
+        downtime_total=Sum('downtime'),
+    ).order_by('group')
+
+    recovery_methods = defaultdict(dict)
+    for group, recovery_method, count in claims.values('group', 'recovery_method').annotate(
+            count=Count('id')).values_list('group', 'recovery_method', 'count'):
+        recovery_methods[group][recovery_method] = count
+
+    medians = _medians(claims)
+    mtbf = _mtbf(claims)
+
+    return [{
+        'key': _key(row['group']),
+        'failures': row['failures'],
+        'machines': row['machines'],
+        'downtime_mean': _days(row['downtime_mean']),
+        'downtime_median': _days(medians.get(row['group'])),
+        'downtime_total': _days(row['downtime_total']),
+        'mtbf': mtbf.get(row['group']),
+        'recovery_methods': recovery_methods[row['group']],
+    } for row in totals]
+
+
+def fleet_analytics(scope, group_by, date_from=None, date_to=None):
+    # Any change to a machine or claim appends to the change log, so its head is the cache version.
+    params = f'{scope.role}:{scope.company_id}:{scope.user_id}:{group_by}:{date_from}:{date_to}:{latest_version()}'
+    key = f'analytics:{hashlib.md5(params.encode()).hexdigest()}'
+    result = cache.get(key)
+    if result is None:
+        queryset = scope_queryset(Claim.objects.all(), scope, 'machine__')
+        if date_from:
+            queryset = queryset.filter(failure_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(failure_date__lte=date_to)
+        result = compute(queryset, group_by)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
@@ -0,0 +1,173 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .conditional import etag_matches, row_etag
+from .metrics import serializing
+from .dictionaries import load_dictionaries, dictionaries_version, SHARED_DICTIONARIES, MACHINE_DICTIONARIES, \
+    MAINTENANCE_DICTIONARIES, CLAIM_DICTIONARIES
+from .renderers import FastJSONRenderer
+from .replicas import replica_reads
+from .scoping import get_scope
+from .views import MachineViewSet, MaintenanceViewSet, ClaimViewSet, embed_dictionaries, serialize_rows, \
+    model_permissions, dictionaries_not_modified, dictionaries_headers, user_info_data
+
+# Resource -> (viewset, response key, embedded dictionaries, permission model name)
+RESOURCES = {
+    'machines': (MachineViewSet, 'machines', MACHINE_DICTIONARIES, 'machine'),
+    'maintenances': (MaintenanceViewSet, 'maintenances', MAINTENANCE_DICTIONARIES, 'maintenance'),
+    'claims': (ClaimViewSet, 'claims', CLAIM_DICTIONARIES, 'claim'),
+}
+
+
+class _ReadView(APIView):
+    permission_classes = [IsAuthenticated]
+
+
+def _prepare(view_class, request, action=None, **kwargs):
+    # Authentication, scope, permissions and throttles run on the request's own thread, as in a sync view.
+    view = view_class(action_map={'get': action}, args=(), kwargs=kwargs, format_kwarg=None) if action \
+        else view_class(args=(), kwargs=kwargs, format_kwarg=None)
+    view.renderer_classes = [FastJSONRenderer]
+    view.headers = view.default_response_headers
+    view.request = view.initialize_request(request, **kwargs)
+    try:
+        view.initial(view.request, **kwargs)
+    except (APIException, Http404) as exc:
+        return view, view.handle_exception(exc), False
+    # Resolved here so that nothing on the event loop has to query for it.
+    get_scope(view.request)
+    # Rows written inside an open transaction are invisible to other connections.
+    offload = not any(connection.in_atomic_block for connection in connections.all(initialized_only=True))
+    return view, None, offload
+
+
+def _closing(call):
+    def run():
+        try:
+            return call()
+        finally:
+            close_old_connections()
+
+    return run
+
+
+async def _gather(offload, *calls):
+    # Independent queries run side by side on worker threads, each with its own connection.
+    if offload:
+        return await asyncio.gather(*(sync_to_async(_closing(call), thread_sensitive=False)() for call in calls))
+    return [await sync_to_async(call)() for call in calls]
+
+
+def _render(view, response):
+    response = view.finalize_response(view.request, response)
+    return response.render()
+
+
+async def _run(view, coroutine):
+    try:
+        response = await coroutine
+    except (APIException, Http404) as exc:
+        response = view.handle_exception(exc)
+    return _render(view, response)
+
+
+async def resource_list(request, resource):
+    if resource not in RESOURCES:
+        raise Http404
+    viewset, key, names, model = RESOURCES[resource]
+    with replica_reads(request):
+        return await _list(viewset, key, names, model, request)
+
+
+async def _list(viewset, key, names, model, request):
+    view, error, offload = await sync_to_async(_prepare)(viewset, request, 'list')
+    if error:
+        return _render(view, error)
+
+    async def respond():
+        def rows():
+            queryset = view.get_queryset()
+            page = view.paginate_queryset(queryset)
+            return serialize_rows(view.request, view.list_serializer_class, queryset if page is None else page), page
+
+        (data, page), dictionaries, permissions = await _gather(
+            offload,
+            rows,
+            lambda: embed_dictionaries(view.request, names),
+            lambda: model_permissions(view.request.user, model),
+        )
+        payload = {key: data, **dictionaries, 'permissions': permissions}
+        if page is not None:
+            payload['next_cursor'] = view.paginator.next_cursor
+        return Response(payload)
+
+    return await _run(view, respond())
+
+
+async def resource_detail(request, resource, pk):
+    if resource not in RESOURCES:
+        raise Http404
+    with replica_reads(request):
+        return await _detail(RESOURCES[resource][0], request, pk)
+
+
+async def _detail(viewset, request, pk):
+    view, error, offload = await sync_to_async(_prepare)(viewset, request, 'retrieve', pk=pk)
+    if error:
+        return _render(view, error)
+
+    async def respond():
+        try:
+            instance = await view.filter_queryset(view.get_queryset()).aget(pk=pk)
+        except view.get_queryset().model.DoesNotExist:
+            raise Http404
+        view.check_object_permissions(view.request, instance)
+
+        etag = row_etag(instance)
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            # Serializers may still follow relations, which the async ORM does not allow here.
+            def data():
+                with serializing(view.request):
+                    return view.get_serializer(instance).data
+
+            response = Response(await sync_to_async(data)())
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    return await _run(view, respond())
+
+
+async def dictionaries(request):
+    view, error, offload = await sync_to_async(_prepare)(_ReadView, request)
+    if error:
+        return _render(view, error)
+
+    async def respond():
+        version = dictionaries_version(SHARED_DICTIONARIES)
+        if dictionaries_not_modified(view.request, version):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            (data, version), = await _gather(offload, lambda: load_dictionaries(SHARED_DICTIONARIES))
+            response = Response({'dictionaries': data, 'dictionaries_version': version})
+        return dictionaries_headers(view.request, response, version)
+
+    return await _run(view, respond())
+
+
+async def user_info(request):
+    view, error, offload = await sync_to_async(_prepare)(_ReadView, request)
+    if error:
+        return _render(view, error)
+    return _render(view, Response(user_info_data(view.request)))
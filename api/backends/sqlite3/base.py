@@ -0,0 +1,8 @@
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        # A deferred transaction that reads before it writes cannot wait for the write lock, whatever busy_timeout is,
+        # so atomic blocks take it up front.
+        self.cursor().execute('BEGIN IMMEDIATE')
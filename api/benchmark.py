@@ -0,0 +1,257 @@
+import datetime
+import platform
+import random
+import threading
+import time
+from statistics import median, quantiles
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction, OperationalError
+from django.db.models import Q
+from django.test import Client
+
+from .changes import latest_version
+from .models import Machine, Maintenance, Claim, ServiceCompany
+from .serializers import MachineListSerializer
+
+REPEAT = 20
+PAGE_SIZE = 100
+
+# Name -> (roles, url template); {serial} and {id} are filled from a machine the role can see.
+ENDPOINTS = {
+    'machines_list': (('client', 'service_company', 'manager'), '/api/machines/'),
+    'machines_columns': (('client', 'service_company', 'manager'), '/api/machines/?shape=columns'),
+    'machines_rows': (('client', 'service_company', 'manager'), '/api/machines/rows/?startRow=0&endRow=100'),
+    'machines_export': (('manager',), '/api/machines/export/?file_format=csv'),
+    'machine_retrieve': (('client', 'service_company', 'manager'), '/api/machines/{id}/'),
+    'machine_full_detail': (('client', 'service_company', 'manager'), '/api/machines/{serial}/detail/'),
+    'public_info': (('anonymous',), '/api/machines/public_info/?serial_number={serial}'),
+    'maintenances_list': (('client', 'service_company', 'manager'), '/api/maintenances/'),
+    'claims_list': (('client', 'service_company', 'manager'), '/api/claims/'),
+    'user_info': (('client', 'service_company', 'manager'), '/api/auth/user/info/'),
+    'dictionaries': (('client', 'manager'), '/api/dictionaries/'),
+    'changes': (('client', 'service_company', 'manager'), '/api/changes/'),
+    'analytics': (('manager',), '/api/analytics/?group_by=failure_node'),
+    'forecast': (('service_company', 'manager'), '/api/forecast/?days=30'),
+}
+
+
+def _users():
+    company = ServiceCompany.objects.filter(service_manager__isnull=False).order_by('id').first()
+    machine = Machine.objects.order_by('id').first()
+    return {
+        'anonymous': None,
+        'client': machine.client if machine else None,
+        'service_company': company.service_manager if company else None,
+        'manager': User.objects.filter(is_staff=True, is_active=True).order_by('-is_superuser', 'id').first(),
+    }
+
+
+def _machine(user):
+    machines = Machine.objects.order_by('id')
+    if user is not None and not user.is_staff:
+        machines = machines.filter(Q(client=user) | Q(service_company__service_manager=user))
+    return machines.values('id', 'serial_number').first()
+
+
+def _host():
+    for host in settings.ALLOWED_HOSTS:
+        if host and host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _request(client, url):
+    counter = _QueryCounter()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        response = client.get(url)
+        size = len(b''.join(response.streaming_content)) if response.streaming else len(response.content)
+    return (time.perf_counter() - started) * 1000, response.status_code, size, counter.count
+
+
+def _percentile(values, percent):
+    if len(values) < 2:
+        return values[0]
+    return quantiles(values, n=100, method='inclusive')[percent - 1]
+
+
+def measure(client, url, repeat=REPEAT):
+    cache.clear()
+    first_ms, status_code, size, queries = _request(client, url)
+    timings = [_request(client, url)[0] for _ in range(repeat)]
+    return {
+        'url': url,
+        'status': status_code,
+        'bytes': size,
+        'queries': queries,
+        'first_ms': round(first_ms, 2),
+        'p50_ms': round(median(timings), 2),
+        'p90_ms': round(_percentile(timings, 90), 2),
+        'p99_ms': round(_percentile(timings, 99), 2),
+        'max_ms': round(max(timings), 2),
+    }
+
+
+def run(repeat=REPEAT, names=None, accept_encoding=''):
+    results = {}
+    for role, user in _users().items():
+        if role != 'anonymous' and user is None:
+            continue
+        client = Client(HTTP_HOST=_host(), HTTP_ACCEPT_ENCODING=accept_encoding)
+        if user is not None:
+            client.force_login(user)
+        machine = _machine(user)
+        for name, (roles, template) in ENDPOINTS.items():
+            if role not in roles or (names and name not in names):
+                continue
+            if '{' in template and machine is None:
+                continue
+            url = template.format(id=machine and machine['id'], serial=machine and machine['serial_number'])
+            results[f'{name}:{role}'] = measure(client, url, repeat)
+
+    return {
+        'meta': {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'repeat': repeat,
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'debug': settings.DEBUG,
+            'rows': {
+                'machines': Machine.objects.count(),
+                'maintenances': Maintenance.objects.count(),
+                'claims': Claim.objects.count(),
+                'changes': latest_version(),
+            },
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline):
+    # Relative change of the median latency and the query count against an earlier report.
+    rows = []
+    for key, result in report['results'].items():
+        before = baseline.get('results', {}).get(key)
+        if before is None:
+            continue
+        change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        rows.append((key, before['p50_ms'], result['p50_ms'], change, before['queries'], result['queries']))
+    return rows
+
+
+def database_profile():
+    profile = {'vendor': connection.vendor, 'conn_max_age': connection.settings_dict['CONN_MAX_AGE']}
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            for name in settings.SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {name}')
+                profile[name] = cursor.fetchone()[0]
+    return profile
+
+
+def _read(rng, count):
+    # One grid page of machines, serialized as the list endpoint does.
+    offset = rng.randrange(max(count - PAGE_SIZE, 1))
+    rows = Machine.objects.select_related('stats').order_by('shipment_date')[offset:offset + PAGE_SIZE]
+    return MachineListSerializer(rows, many=True).data
+
+
+def _write(rng, ids):
+    # A cell edit: lock, re-save with signals, version bump and change log, as a PATCH does.
+    with transaction.atomic():
+        machine = Machine.objects.select_for_update().get(pk=rng.choice(ids))
+        machine.save(update_fields=['consignee'])
+
+
+def _worker(seed, deadline, write_share, ids, count, results):
+    rng = random.Random(seed)
+    result = {'reads': [], 'writes': [], 'errors': 0}
+    try:
+        while time.perf_counter() < deadline:
+            write = rng.random() < write_share
+            started = time.perf_counter()
+            try:
+                _write(rng, ids) if write else _read(rng, count)
+            except OperationalError:
+                result['errors'] += 1
+                continue
+            result['writes' if write else 'reads'].append((time.perf_counter() - started) * 1000)
+    finally:
+        connection.close()
+        results.append(result)
+
+
+def _summary(timings, seconds):
+    if not timings:
+        return {'count': 0, 'per_second': 0, 'p50_ms': None, 'p99_ms': None}
+    return {
+        'count': len(timings),
+        'per_second': round(len(timings) / seconds, 1),
+        'p50_ms': round(median(timings), 2),
+        'p99_ms': round(_percentile(timings, 99), 2),
+    }
+
+
+def concurrency(threads=(1, 4, 16), seconds=10, write_share=0.2, seed=0):
+    # Mixed grid reads and cell edits from parallel threads, each on its own connection like separate workers.
+    ids = list(Machine.objects.order_by('id').values_list('id', flat=True)[:1000])
+    count = Machine.objects.count()
+    results = {}
+    for thread_count in threads:
+        collected = []
+        deadline = time.perf_counter() + seconds
+        workers = [
+            threading.Thread(target=_worker, args=(seed + n, deadline, write_share, ids, count, collected))
+            for n in range(thread_count)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        reads = [timing for result in collected for timing in result['reads']]
+        writes = [timing for result in collected for timing in result['writes']]
+        results[f'{thread_count} threads'] = {
+            'reads': _summary(reads, seconds),
+            'writes': _summary(writes, seconds),
+            'errors': sum(result['errors'] for result in collected),
+        }
+
+    return {
+        'meta': {
+            'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'seconds': seconds,
+            'write_share': write_share,
+            'database': database_profile(),
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'rows': {'machines': count},
+        },
+        'results': results,
+    }
+
+
+def compare_concurrency(report, baseline):
+    rows = []
+    for key, result in report['results'].items():
+        before = baseline.get('results', {}).get(key)
+        if before is None:
+            continue
+        for kind in ('reads', 'writes'):
+            rows.append((key, kind, before[kind]['per_second'], result[kind]['per_second']))
+        rows.append((key, 'errors', before['errors'], result['errors']))
+    return rows
@@ -0,0 +1,194 @@
+from django.db import transaction, IntegrityError
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Machine, Maintenance, Claim, MachineStats, normalize_serial
+from .signals import bulk_saved, bulk_deleted
+
+MAX_BATCH_SIZE = 1000
+
+
+def _results(items, errors, not_found=(), conflicts=()):
+    results = []
+    for index, item in enumerate(items):
+        if index in not_found:
+            results.append({'index': index, 'status': status.HTTP_404_NOT_FOUND, 'id': item})
+        elif index in conflicts:
+            results.append({'index': index, 'status': status.HTTP_412_PRECONDITION_FAILED, 'id': item['id'],
+                            'version': conflicts[index]})
+        elif errors and errors[index]:
+            results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors[index]})
+        else:
+            results.append({'index': index, 'status': status.HTTP_424_FAILED_DEPENDENCY})
+    return results
+
+
+def _machine_id(item):
+    # Anything that is not an id is left for the serializer to report.
+    if not isinstance(item, dict) or 'service_company' in item or isinstance(item.get('machine'), bool):
+        return None
+    try:
+        return int(item.get('machine'))
+    except (TypeError, ValueError):
+        return None
+
+
+class BulkMixin:
+    service_company_from_machine = False
+
+    def _bulk_items(self, request, key):
+        items = request.data.get(key) if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return None, Response({"error": f"Необходимо передать непустой список {key}"},
+                                  status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_BATCH_SIZE:
+            return None, Response({"error": f"Не более {MAX_BATCH_SIZE} записей за один запрос"},
+                                  status=status.HTTP_400_BAD_REQUEST)
+        return items, None
+
+    def _bulk_ids(self, values):
+        try:
+            return [int(value) for value in values], None
+        except (TypeError, ValueError):
+            return None, Response({"error": "Идентификаторы записей должны быть целыми числами"},
+                                  status=status.HTTP_400_BAD_REQUEST)
+
+    def _with_service_company(self, items):
+        if not self.service_company_from_machine:
+            return items
+
+        machine_ids = {index: _machine_id(item) for index, item in enumerate(items)}
+        service_companies = dict(Machine.objects.filter(
+            id__in={pk for pk in machine_ids.values() if pk is not None}
+        ).values_list('id', 'service_company_id'))
+        return [
+            {**item, 'service_company': service_companies[machine_ids[index]]}
+            if machine_ids[index] in service_companies else item
+            for index, item in enumerate(items)
+        ]
+
+    def _bulk_create(self, request):
+        items, error = self._bulk_items(request, 'items')
+        if error:
+            return error
+
+        serializer = self.get_serializer(data=self._with_service_company(items), many=True)
+        if not serializer.is_valid():
+            return Response({'results': _results(items, serializer.errors)}, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        instances = [model(**data) for data in serializer.validated_data]
+        # bulk_create skips save(), which is what fills the search column.
+        if model is Machine:
+            for instance in instances:
+                instance.serial_number_normalized = normalize_serial(instance.serial_number)
+        try:
+            with transaction.atomic():
+                model.objects.bulk_create(instances, batch_size=500)
+                bulk_saved.send(sender=model, instances=instances, created=True, using=model.objects.db)
+        except IntegrityError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_201_CREATED, 'id': instance.pk}
+            for index, instance in enumerate(instances)
+        ]}, status=status.HTTP_201_CREATED)
+
+    def _bulk_update(self, request):
+        items, error = self._bulk_items(request, 'items')
+        if error:
+            return error
+
+        ids, error = self._bulk_ids(item.get('id') if isinstance(item, dict) else None for item in items)
+        if error:
+            return error
+
+        try:
+            with transaction.atomic():
+                # Only the rows themselves: FOR UPDATE cannot lock the nullable side of select_related's outer joins.
+                instances = self.get_queryset().select_for_update(of=('self',)).in_bulk(ids)
+                not_found = {index for index, pk in enumerate(ids) if pk not in instances}
+                if not_found:
+                    return Response({'results': _results(ids, None, not_found)}, status=status.HTTP_404_NOT_FOUND)
+
+                # Items sent with the version they were read at are only applied to that version.
+                conflicts = {
+                    index: instances[pk].version for index, (pk, item) in enumerate(zip(ids, items))
+                    if 'version' in item and item['version'] != instances[pk].version
+                }
+                if conflicts:
+                    return Response({'results': _results(items, None, conflicts=conflicts)},
+                                    status=status.HTTP_412_PRECONDITION_FAILED)
+
+                # Each item is matched to its instance by id, which must be the same int in_bulk keyed them by.
+                items = [{**item, 'id': pk} for pk, item in zip(ids, items)]
+                serializer = self.get_serializer(instance=instances, data=items, many=True, partial=True)
+                if not serializer.is_valid():
+                    return Response({'results': _results(items, serializer.errors)},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+                fields = set()
+                for pk, data in zip(ids, serializer.validated_data):
+                    for field, value in data.items():
+                        setattr(instances[pk], field, value)
+                        fields.add(field)
+
+                model = self.get_queryset().model
+                updated = [instances[pk] for pk in dict.fromkeys(ids)]
+                if model is Machine and 'serial_number' in fields:
+                    for instance in updated:
+                        instance.serial_number_normalized = normalize_serial(instance.serial_number)
+                    fields.add('serial_number_normalized')
+
+                if fields:
+                    for instance in updated:
+                        instance.version += 1
+                    model.objects.bulk_update(updated, fields | {'version'}, batch_size=500)
+                bulk_saved.send(sender=model, instances=updated, created=False, using=model.objects.db)
+        except IntegrityError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_200_OK, 'id': pk, 'version': instances[pk].version}
+            for index, pk in enumerate(ids)
+        ]})
+
+    def _bulk_delete(self, request):
+        ids, error = self._bulk_items(request, 'ids')
+        if error:
+            return error
+        ids, error = self._bulk_ids(ids)
+        if error:
+            return error
+
+        model = self.get_queryset().model
+        using = model.objects.db
+        with transaction.atomic():
+            instances = list(self.get_queryset().filter(id__in=ids).order_by())
+            found = {instance.pk for instance in instances}
+            deleted = [(model, instances)]
+            if model is Machine:
+                # The cascade, done the same way, so that nothing is left for the per-row collector.
+                deleted = [(related, list(related.objects.filter(machine__in=found).select_related('machine')))
+                           for related in (Maintenance, Claim)] + deleted
+                MachineStats.objects.filter(machine__in=found)._raw_delete(using)
+            for deleted_model, deleted_instances in deleted:
+                # One DELETE; the post_delete handlers run once per batch through bulk_deleted instead of per row.
+                deleted_model.objects.filter(pk__in=[instance.pk for instance in deleted_instances])._raw_delete(using)
+            for deleted_model, deleted_instances in deleted:
+                bulk_deleted.send(sender=deleted_model, instances=deleted_instances, using=using)
+
+        return Response({'results': [
+            {'index': index, 'status': status.HTTP_204_NO_CONTENT if pk in found else status.HTTP_404_NOT_FOUND,
+             'id': pk}
+            for index, pk in enumerate(ids)
+        ]})
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request):
+        if request.method == 'POST':
+            return self._bulk_create(request)
+        if request.method == 'PATCH':
+            return self._bulk_update(request)
+        return self._bulk_delete(request)
@@ -0,0 +1,146 @@
+from django.db import connections, transaction
+from django.db.models import Q
+
+from . import events
+
+from .models import Machine, Maintenance, Claim, ChangeLog
+from .scoping import MANAGER, SERVICE_COMPANY, CLIENT, scope_queryset
+from .serializers import MachineListSerializer, MaintenanceListSerializer, ClaimListSerializer
+
+MAX_CHANGES = 5000
+
+# Table -> (model, list serializer, response key, path from the model to its machine)
+TABLES = {
+    'machine': (Machine, MachineListSerializer, 'machines', ''),
+    'maintenance': (Maintenance, MaintenanceListSerializer, 'maintenances', 'machine__'),
+    'claim': (Claim, ClaimListSerializer, 'claims', 'machine__'),
+}
+
+
+def _table(model):
+    return model._meta.model_name
+
+
+def _machine_scopes(instances, using):
+    machines = {}
+    missing = set()
+    for instance in instances:
+        machine = instance._state.fields_cache.get('machine')
+        if machine is not None:
+            machines[instance.machine_id] = (machine.service_company_id, machine.client_id)
+        else:
+            missing.add(instance.machine_id)
+    missing -= machines.keys()
+    if missing:
+        machines.update(
+            (pk, (service_company_id, client_id)) for pk, service_company_id, client_id in
+            Machine.objects.using(using).filter(id__in=missing).values_list('id', 'service_company_id', 'client_id')
+        )
+    return machines
+
+
+def remember_scope(instance):
+    instance._changes_scope = (instance.service_company_id, instance.client_id)
+
+
+def _moved(instances, using):
+    # A machine that changed hands disappears, with its history, from the previous owners' view
+    # and appears, with the same history, in the new owners' one.
+    moved = {}
+    for instance in instances:
+        previous = getattr(instance, '_changes_scope', None)
+        current = (instance.service_company_id, instance.client_id)
+        if previous is not None and previous != current:
+            moved[instance.pk] = (previous, current)
+        instance._changes_scope = current
+    if not moved:
+        return []
+
+    entries = [ChangeLog(table='machine', object_id=pk, action=ChangeLog.DELETE,
+                         service_company_id=previous[0], client_id=previous[1])
+               for pk, (previous, current) in moved.items()]
+    for model in (Maintenance, Claim):
+        for pk, machine_id in model.objects.using(using).filter(machine__in=moved).values_list('id', 'machine_id'):
+            previous, current = moved[machine_id]
+            entries += [
+                ChangeLog(table=_table(model), object_id=pk, action=ChangeLog.DELETE,
+                          service_company_id=previous[0], client_id=previous[1]),
+                ChangeLog(table=_table(model), object_id=pk, action=ChangeLog.UPSERT,
+                          service_company_id=current[0], client_id=current[1]),
+            ]
+    return entries
+
+
+def _serialize_writes(using):
+    # Clients resume from the highest id they have seen, so ids must be handed out in commit order. PostgreSQL
+    # takes them from a sequence in insert order; this lock conflicts with itself and is held until commit.
+    # SQLite opens write transactions with BEGIN IMMEDIATE and so has a single writer already.
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {ChangeLog._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')
+
+
+def record(model, instances, action, using):
+    entries = []
+    if model is Machine:
+        if action == ChangeLog.UPSERT:
+            entries = _moved(instances, using)
+        scopes = {instance.pk: (instance.service_company_id, instance.client_id) for instance in instances}
+    else:
+        machines = _machine_scopes(instances, using)
+        scopes = {instance.pk: machines.get(instance.machine_id, (None, None)) for instance in instances}
+
+    with transaction.atomic(using=using):
+        _serialize_writes(using)
+        entries = ChangeLog.objects.using(using).bulk_create(entries + [
+            ChangeLog(table=_table(model), object_id=instance.pk, action=action,
+                      service_company_id=scopes[instance.pk][0], client_id=scopes[instance.pk][1])
+            for instance in instances
+        ])
+    events.publish(entries, using)
+
+
+def latest_version():
+    return ChangeLog.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _visible(scope):
+    if scope.role == MANAGER:
+        return Q()
+    if scope.role == SERVICE_COMPANY:
+        return Q(service_company_id=scope.company_id)
+    if scope.role == CLIENT:
+        return Q(client_id=scope.user_id)
+    return Q(pk__in=[])
+
+
+def collect(scope, since, limit=MAX_CHANGES):
+    entries = list(
+        ChangeLog.objects.filter(_visible(scope), id__gt=since).order_by('id')
+        .values_list('id', 'table', 'object_id', 'action')[:limit + 1]
+    )
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+
+    latest = {}
+    for _, table, object_id, action in entries:
+        latest[table, object_id] = action
+
+    changes = {}
+    for table, (model, serializer_class, key, path) in TABLES.items():
+        upserts = [object_id for (name, object_id), action in latest.items()
+                   if name == table and action == ChangeLog.UPSERT]
+        deletes = [object_id for (name, object_id), action in latest.items()
+                   if name == table and action == ChangeLog.DELETE]
+        rows = serializer_class(scope_queryset(model.objects.all(), scope, path).filter(id__in=upserts), many=True).data
+        # Rows changed but no longer visible (e.g. moved to another service company) are tombstones too.
+        visible = {row['id'] for row in rows}
+        deletes += [object_id for object_id in upserts if object_id not in visible]
+        changes[key] = {'upserts': rows, 'deletes': deletes}
+
+    return {
+        'version': entries[-1][0] if entries else since,
+        'has_more': has_more,
+        'changes': changes,
+    }
@@ -0,0 +1,194 @@
+import mimetypes
+import os
+import re
+import zlib
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.http import FileResponse, Http404, HttpResponseNotModified
+from django.middleware.gzip import GZipMiddleware
+from django.utils._os import safe_join
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_SIZE = 1024
+SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+COMPRESSIBLE = ('.js', '.css', '.svg', '.ttf', '.otf', '.html', '.json', '.map', '.txt', '.xml')
+# Vite appends an 8 character content hash to every bundled asset name.
+HASHED_NAME = re.compile(r'-[A-Za-z0-9_-]{8}\.[A-Za-z0-9]+$')
+
+
+def accepted_encodings(request):
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if quality > 0:
+            accepted[name.strip().lower()] = quality
+    encodings = ['br', 'gzip'] if brotli else ['gzip']
+    return [encoding for encoding in encodings if encoding in accepted]
+
+
+class _Gzip:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def flush(self):
+        return self.compressor.flush()
+
+
+class _Brotli:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def flush(self):
+        return self.compressor.finish()
+
+
+def compressor(encoding, best=False):
+    if encoding == 'br':
+        return _Brotli(11 if best else 5)
+    return _Gzip(9 if best else 6)
+
+
+def compress(data, encoding, best=False):
+    stream = compressor(encoding, best)
+    return stream.compress(data) + stream.flush()
+
+
+def compress_sequence(chunks, encoding):
+    stream = compressor(encoding)
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.flush()
+
+
+async def acompress_sequence(chunks, encoding):
+    stream = compressor(encoding)
+    async for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.flush()
+
+
+def carries_secrets(request, response):
+    # Credentials sent or cookies set mean the body may hold a secret next to attacker-controlled input (BREACH).
+    return bool(request.META.get('HTTP_COOKIE') or request.META.get('HTTP_AUTHORIZATION') or response.cookies)
+
+
+class CompressionMiddleware(GZipMiddleware):
+    # gzip comes from Django, which pads every response with a random file name against BREACH;
+    # brotli has no such padding and is kept for responses without secrets.
+    def process_response(self, request, response):
+        if not response.streaming and len(response.content) < MIN_SIZE:
+            return response
+        # Event streams must reach the client as soon as they are written.
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+
+        encodings = accepted_encodings(request)
+        if 'br' not in encodings or carries_secrets(request, response):
+            if 'gzip' not in encodings:
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+            return super().process_response(request, response)
+        if response.has_header('Content-Encoding'):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_sequence(response.streaming_content, 'br')
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content, 'br')
+            del response.headers['Content-Length']
+        else:
+            content = compress(response.content, 'br')
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response.headers['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class CompressedStaticFilesStorage(StaticFilesStorage):
+    def post_process(self, paths, dry_run=False, **options):
+        if dry_run:
+            return
+        for name in paths:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            with self.open(name) as file:
+                content = file.read()
+            for encoding in (['br', 'gzip'] if brotli else ['gzip']):
+                compressed = compress(content, encoding, best=True)
+                variant = self.path(name + SUFFIXES[encoding])
+                if len(compressed) < len(content) * 0.95:
+                    with open(variant, 'wb') as file:
+                        file.write(compressed)
+                elif os.path.exists(variant):
+                    os.remove(variant)
+            yield name, name, True
+
+
+def _find(path):
+    if settings.STATIC_ROOT:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+        if os.path.isfile(full_path):
+            return full_path
+    return finders.find(path)
+
+
+def serve_static(request, path):
+    full_path = _find(path)
+    if not full_path:
+        raise Http404
+
+    served, encoding = full_path, None
+    for accepted in accepted_encodings(request):
+        if os.path.isfile(full_path + SUFFIXES[accepted]):
+            served, encoding = full_path + SUFFIXES[accepted], accepted
+            break
+
+    mtime = os.stat(served).st_mtime
+    if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), mtime):
+        response = HttpResponseNotModified()
+    else:
+        content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        response = FileResponse(open(served, 'rb'), content_type=content_type, filename=os.path.basename(full_path))
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+
+    response.headers['Last-Modified'] = http_date(mtime)
+    if HASHED_NAME.search(path):
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
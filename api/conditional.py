@@ -0,0 +1,65 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .metrics import serializing
+
+
+def row_etag(instance):
+    return quote_etag(f'{instance.pk}.{instance.version}')
+
+
+def etag_matches(header, etag):
+    # Compression weakens the tag on the way out; the row version behind it is the same.
+    tags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in tags or etag in tags
+
+
+class ConditionalMixin:
+    def get_object(self):
+        if self.action not in ('update', 'partial_update'):
+            return super().get_object()
+
+        # The row stays locked until the update commits, so the version checked is the version replaced.
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).select_for_update(of=('self',))
+        instance = get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, instance)
+        return instance
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = row_etag(instance)
+        if etag_matches(request.META.get('HTTP_IF_NONE_MATCH', ''), etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            with serializing(request):
+                response = Response(self.get_serializer(instance).data)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def update(self, request, *args, **kwargs):
+        partial = kwargs.pop('partial', False)
+        with transaction.atomic():
+            instance = self.get_object()
+            if_match = request.META.get('HTTP_IF_MATCH')
+            if if_match and not etag_matches(if_match, row_etag(instance)):
+                response = Response(
+                    {"error": "Запись была изменена другим пользователем", "version": instance.version},
+                    status=status.HTTP_412_PRECONDITION_FAILED
+                )
+                response['ETag'] = row_etag(instance)
+                return response
+
+            serializer = self.get_serializer(instance, data=request.data, partial=partial)
+            serializer.is_valid(raise_exception=True)
+            self.perform_update(serializer)
+
+        with serializing(request):
+            response = Response(serializer.data)
+        response['ETag'] = row_etag(serializer.instance)
+        return response
@@ -0,0 +1,142 @@
+import hashlib
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Case, When, Value, IntegerField
+
+from .replicas import primary_reads
+from .models import Machine, Maintenance, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
+    DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod
+from .serializers import MachineLimitedListSerializer, MachineModelSerializer, EngineModelSerializer, \
+    TransmissionModelSerializer, DriveAxleModelSerializer, SteeringAxleModelSerializer, MaintenanceTypeSerializer, \
+    FailureNodeSerializer, RecoveryMethodSerializer, ServiceCompanySerializer, UserSerializer
+
+VERSION_KEY = 'dictionaries:version:{}'
+DATA_KEY = 'dictionaries:data:{}'
+DATA_TIMEOUT = 60 * 60 * 24
+
+_local = {}
+
+
+def _reference(serializer_class):
+    def build():
+        return serializer_class(serializer_class.Meta.model.objects.all().order_by('name'), many=True).data
+
+    return build
+
+
+def _machines():
+    return MachineLimitedListSerializer(Machine.objects.all().order_by('serial_number'), many=True).data
+
+
+def _service_companies():
+    return ServiceCompanySerializer(ServiceCompany.objects.all().order_by('name'), many=True).data
+
+
+def _organizations():
+    return [{'id': None, 'name': Maintenance.SELF_SERVICE}] + list(_service_companies())
+
+
+def _clients():
+    users = User.objects.select_related('service_company').annotate(
+        first_name_null=Case(When(first_name='', then=Value(1)), When(first_name__isnull=True, then=Value(1)),
+                             default=Value(0), output_field=IntegerField())
+    ).order_by('first_name_null', 'first_name', 'username')
+    return UserSerializer(users, many=True).data
+
+
+DICTIONARIES = {
+    'models': (_reference(MachineModelSerializer), (MachineModel,)),
+    'engine_models': (_reference(EngineModelSerializer), (EngineModel,)),
+    'transmission_models': (_reference(TransmissionModelSerializer), (TransmissionModel,)),
+    'drive_axle_models': (_reference(DriveAxleModelSerializer), (DriveAxleModel,)),
+    'steering_axle_models': (_reference(SteeringAxleModelSerializer), (SteeringAxleModel,)),
+    'maintenance_types': (_reference(MaintenanceTypeSerializer), (MaintenanceType,)),
+    'failure_nodes': (_reference(FailureNodeSerializer), (FailureNode,)),
+    'recovery_methods': (_reference(RecoveryMethodSerializer), (RecoveryMethod,)),
+    'service_companies': (_service_companies, (ServiceCompany,)),
+    'organizations': (_organizations, (ServiceCompany,)),
+    'clients': (_clients, (User, ServiceCompany)),
+    'machines': (_machines, (Machine,)),
+}
+
+REFERENCE_DICTIONARIES = ('models', 'engine_models', 'transmission_models', 'drive_axle_models',
+                          'steering_axle_models', 'maintenance_types', 'failure_nodes', 'recovery_methods')
+SHARED_DICTIONARIES = REFERENCE_DICTIONARIES + ('service_companies', 'clients')
+MODEL_DICTIONARIES = ('models', 'engine_models', 'transmission_models', 'drive_axle_models', 'steering_axle_models')
+MACHINE_DICTIONARIES = MODEL_DICTIONARIES + ('service_companies', 'clients')
+MAINTENANCE_DICTIONARIES = ('machines', 'maintenance_types', 'organizations')
+CLAIM_DICTIONARIES = ('machines', 'failure_nodes', 'recovery_methods')
+MACHINE_DETAIL_DICTIONARIES = MACHINE_DICTIONARIES + ('maintenance_types', 'organizations', 'failure_nodes',
+                                                      'recovery_methods')
+
+TRACKED_MODELS = tuple({model for _, models in DICTIONARIES.values() for model in models})
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def get_versions(models):
+    keys = {VERSION_KEY.format(_label(model)): _label(model) for model in models}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        # A fresh counter starts from the clock so that a counter lost on cache eviction never
+        # reissues a version some process still holds in its local copy.
+        cache.add(key, time.time_ns(), timeout=None)
+        versions[key] = cache.get(key)
+    return {keys[key]: value for key, value in versions.items()}
+
+
+def bump(*models):
+    for model in models:
+        key = VERSION_KEY.format(_label(model))
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def _stamp(versions, models):
+    return '.'.join(str(versions[_label(model)]) for model in models)
+
+
+def get_dictionary(name, versions):
+    build, models = DICTIONARIES[name]
+    stamp = _stamp(versions, models)
+
+    local = _local.get(name)
+    if local and local[0] == stamp:
+        return local[1]
+
+    # One entry per dictionary, replaced on rebuild, so earlier versions do not pile up in a shared cache.
+    key = DATA_KEY.format(name)
+    cached = cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        data = cached[1]
+    else:
+        # The stamp comes from versions bumped on commit; a lagging replica could pair it with older rows.
+        with primary_reads():
+            data = list(build())
+        cache.set(key, (stamp, data), DATA_TIMEOUT)
+
+    _local[name] = (stamp, data)
+    return data
+
+
+def _models(names):
+    return {model for name in names for model in DICTIONARIES[name][1]}
+
+
+def dictionaries_version(names, versions=None):
+    if versions is None:
+        versions = get_versions(_models(names))
+    payload = ';'.join(f'{label}={versions[label]}' for label in sorted(_label(model) for model in _models(names)))
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+def load_dictionaries(names):
+    versions = get_versions(_models(names))
+    dictionaries = {name: get_dictionary(name, versions) for name in names}
+    return dictionaries, dictionaries_version(names, versions)
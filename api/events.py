@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse, JsonResponse
+
+from .scoping import get_scope, MANAGER, SERVICE_COMPANY, CLIENT
+
+CHANNEL = 'api:changes'
+HEARTBEAT_SECONDS = 15
+# Django 4.2 does not notice a client that went away mid-stream, so a stream ends on its own and the
+# browser reconnects; a dead connection holds its subscription for at most this long.
+STREAM_SECONDS = 5 * 60
+QUEUE_SIZE = 1000
+
+TABLE_NAMES = {'machine': 'machines', 'maintenance': 'maintenances', 'claim': 'claims'}
+
+
+def visible(scope, event):
+    if scope.role == MANAGER:
+        return True
+    if scope.role == SERVICE_COMPANY:
+        return event['service_company_id'] == scope.company_id
+    if scope.role == CLIENT:
+        return event['client_id'] == scope.user_id
+    return False
+
+
+class Subscription:
+    def __init__(self, scope, loop):
+        self.scope = scope
+        self.loop = loop
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.queue.full():
+            # A client that cannot keep up gets one resync instead of an unbounded backlog.
+            self.overflowed = True
+        else:
+            self.queue.put_nowait(event)
+
+
+class LocalBroker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions = set()
+
+    def subscribe(self, scope):
+        subscription = Subscription(scope, asyncio.get_running_loop())
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def dispatch(self, events):
+        with self.lock:
+            subscriptions = list(self.subscriptions)
+        for subscription in subscriptions:
+            for event in events:
+                if visible(subscription.scope, event):
+                    subscription.loop.call_soon_threadsafe(subscription.put, event)
+
+    def publish(self, events):
+        self.dispatch(events)
+
+
+class RedisBroker(LocalBroker):
+    def __init__(self, url):
+        super().__init__()
+        self.url = url
+        self.client = None
+        self.listeners = {}
+
+    def subscribe(self, scope):
+        subscription = super().subscribe(scope)
+        loop = subscription.loop
+        if loop not in self.listeners or self.listeners[loop].done():
+            self.listeners[loop] = loop.create_task(self.listen())
+        return subscription
+
+    async def listen(self):
+        import redis.asyncio
+
+        client = redis.asyncio.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(CHANNEL)
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'message':
+                    self.dispatch(json.loads(message['data']))
+        finally:
+            await pubsub.close()
+            await client.close()
+
+    def publish(self, events):
+        import redis
+
+        if self.client is None:
+            self.client = redis.Redis.from_url(self.url)
+        self.client.publish(CHANNEL, json.dumps(events))
+
+
+_broker = None
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        url = getattr(settings, 'EVENTS_REDIS_URL', '')
+        _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def publish(entries, using):
+    events = [{
+        'version': entry.pk,
+        'table': TABLE_NAMES[entry.table],
+        'id': entry.object_id,
+        'action': entry.action,
+        'service_company_id': entry.service_company_id,
+        'client_id': entry.client_id,
+    } for entry in entries]
+    if events:
+        transaction.on_commit(lambda: get_broker().publish(events), using=using)
+
+
+def _message(event):
+    data = {key: event[key] for key in ('version', 'table', 'id', 'action')}
+    return f"id: {event['version']}\nevent: change\ndata: {json.dumps(data)}\n\n"
+
+
+def supported(request):
+    # A WSGI server would buffer the endless stream and hold a worker thread for it.
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def stream(subscription, seconds=STREAM_SECONDS):
+    broker = get_broker()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+    try:
+        # Changes made while the browser was reconnecting are picked up by a resync.
+        yield 'retry: 5000\nevent: resync\ndata: {}\n\n'
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_SECONDS, remaining))
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            if subscription.overflowed:
+                # The resync covers whatever is still queued.
+                subscription.overflowed = False
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                yield 'event: resync\ndata: {}\n\n'
+                continue
+            yield _message(event)
+    finally:
+        broker.unsubscribe(subscription)
+
+
+async def events(request):
+    if not supported(request):
+        # 204 tells EventSource not to reconnect.
+        return HttpResponse(status=204)
+    scope = await sync_to_async(get_scope)(request)
+    if scope.role not in (MANAGER, SERVICE_COMPANY, CLIENT):
+        return JsonResponse({"error": "Необходима авторизация"}, status=403)
+
+    response = StreamingHttpResponse(stream(get_broker().subscribe(scope)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,262 @@
+import csv
+import datetime
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .models import Machine, Maintenance, Claim, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
+    DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod
+
+CHUNK_SIZE = 2000
+
+CSV = 'csv'
+XLSX = 'xlsx'
+FORMATS = (CSV, XLSX)
+
+
+def reference_names(model):
+    return dict(model.objects.values_list('id', 'name').iterator(chunk_size=CHUNK_SIZE))
+
+
+def client_names():
+    return {
+        pk: service_company or first_name or username
+        for pk, first_name, username, service_company in User.objects.values_list(
+            'id', 'first_name', 'username', 'service_company__name').iterator(chunk_size=CHUNK_SIZE)
+    }
+
+
+def machine_serial_numbers():
+    return dict(Machine.objects.values_list('id', 'serial_number').iterator(chunk_size=CHUNK_SIZE))
+
+
+def _verbose_name(model, field):
+    return str(model._meta.get_field(field).verbose_name)
+
+
+class Export:
+    model = None
+    filename = None
+    fields = ()
+    # Foreign key column -> callable building an {id: name} map, loaded once per export.
+    names = {}
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def header(self):
+        return [_verbose_name(self.model, field) for field in self.fields]
+
+    def row(self, values, names):
+        return [names[field].get(values[field]) if field in names else values[field] for field in self.fields]
+
+    def rows(self):
+        names = {field: load() for field, load in self.names.items()}
+        columns = [f'{field}_id' if field in names else field for field in self.fields]
+        for values in self.queryset.values(*columns).iterator(chunk_size=CHUNK_SIZE):
+            yield self.row({field: values[column] for field, column in zip(self.fields, columns)}, names)
+
+
+class MachineExport(Export):
+    model = Machine
+    filename = 'machines'
+    fields = (
+        'serial_number', 'model', 'engine_model', 'engine_serial_number', 'transmission_model',
+        'transmission_serial_number', 'drive_axle_model', 'drive_axle_serial_number', 'steering_axle_model',
+        'steering_axle_serial_number', 'contract_info', 'shipment_date', 'consignee', 'delivery_address',
+        'equipment', 'client', 'service_company',
+    )
+    names = {
+        'model': lambda: reference_names(MachineModel),
+        'engine_model': lambda: reference_names(EngineModel),
+        'transmission_model': lambda: reference_names(TransmissionModel),
+        'drive_axle_model': lambda: reference_names(DriveAxleModel),
+        'steering_axle_model': lambda: reference_names(SteeringAxleModel),
+        'client': client_names,
+        'service_company': lambda: reference_names(ServiceCompany),
+    }
+
+
+class MaintenanceExport(Export):
+    model = Maintenance
+    filename = 'maintenances'
+    fields = (
+        'machine', 'maintenance_type', 'maintenance_date', 'operating_time', 'order_number', 'order_date',
+        'organization', 'service_company',
+    )
+    names = {
+        'machine': machine_serial_numbers,
+        'maintenance_type': lambda: reference_names(MaintenanceType),
+        'organization': lambda: reference_names(ServiceCompany),
+        'service_company': lambda: reference_names(ServiceCompany),
+    }
+
+    def row(self, values, names):
+        row = super().row(values, names)
+        # Same rule as Maintenance.get_organization_display.
+        if values['organization'] is None:
+            row[self.fields.index('organization')] = Maintenance.SELF_SERVICE
+        return row
+
+
+class ClaimExport(Export):
+    model = Claim
+    filename = 'claims'
+    fields = (
+        'machine', 'failure_date', 'operating_time', 'failure_node', 'failure_description', 'recovery_method',
+        'spare_parts_used', 'recovery_date', 'service_company',
+    )
+    names = {
+        'machine': machine_serial_numbers,
+        'failure_node': lambda: reference_names(FailureNode),
+        'recovery_method': lambda: reference_names(RecoveryMethod),
+        'service_company': lambda: reference_names(ServiceCompany),
+    }
+
+    def header(self):
+        return super().header() + ['Время простоя техники']
+
+    def row(self, values, names):
+        # Same value as the Claim.downtime property.
+        return super().row(values, names) + [(values['recovery_date'] - values['failure_date']).days]
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(export):
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff' + writer.writerow(export.header())
+    for row in export.rows():
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+class _ZipStream:
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="{sheet}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c t="n"><v>{value}</v></c>'
+    if isinstance(value, datetime.date):
+        value = value.isoformat()
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def _xlsx_row(row):
+    return ('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode()
+
+
+def stream_xlsx(export):
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as workbook:
+        for name, content in XLSX_PARTS.items():
+            workbook.writestr(name, content.format(sheet=export.filename))
+        yield stream.drain()
+
+        with workbook.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                        b'<sheetData>')
+            sheet.write(_xlsx_row(export.header()))
+            for number, row in enumerate(export.rows(), 1):
+                sheet.write(_xlsx_row(row))
+                if number % CHUNK_SIZE == 0:
+                    yield stream.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield stream.drain()
+
+
+def export_response(export, file_format):
+    if file_format == XLSX:
+        response = StreamingHttpResponse(
+            stream_xlsx(export),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        )
+    else:
+        response = StreamingHttpResponse(stream_csv(export), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{export.filename}.{file_format}"'
+    return response
+
+
+class ExportMixin:
+    export_class = None
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        file_format = request.query_params.get('file_format', CSV)
+        if file_format not in FORMATS:
+            return Response(
+                {"error": f"Неподдерживаемый формат выгрузки: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return export_response(self.export_class(self.get_queryset()), file_format)
@@ -0,0 +1,123 @@
+import datetime
+import math
+from collections import defaultdict
+from statistics import median
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .changes import latest_version
+from .dictionaries import get_versions
+from .models import Machine, Maintenance, Claim, MaintenanceType
+from .scoping import scope_queryset, MANAGER
+
+CHUNK_SIZE = 5000
+CACHE_TIMEOUT = 60 * 60 * 24
+MAX_DAYS = 365
+EPOCH = datetime.date(1970, 1, 1)
+
+
+def _observations():
+    # (machine, date, operating hours): shipment is hour zero, then every maintenance and claim.
+    for machine_id, shipment_date in Machine.objects.values_list('id', 'shipment_date').iterator(chunk_size=CHUNK_SIZE):
+        if shipment_date:
+            yield machine_id, shipment_date, 0
+    yield from Maintenance.objects.values_list('machine', 'maintenance_date', 'operating_time').iterator(
+        chunk_size=CHUNK_SIZE)
+    yield from Claim.objects.values_list('machine', 'failure_date', 'operating_time').iterator(chunk_size=CHUNK_SIZE)
+
+
+def usage_rates():
+    # Least squares slope of hours over days per machine, accumulated in one pass over the fleet's history.
+    sums = defaultdict(lambda: [0, 0, 0, 0, 0])
+    latest = {}
+    for machine_id, date, hours in _observations():
+        x = (date - EPOCH).days
+        s = sums[machine_id]
+        s[0] += 1
+        s[1] += x
+        s[2] += hours
+        s[3] += x * hours
+        s[4] += x * x
+        if machine_id not in latest or (date, hours) > latest[machine_id]:
+            latest[machine_id] = (date, hours)
+
+    rates = {}
+    for machine_id, (n, sx, sy, sxy, sxx) in sums.items():
+        denominator = n * sxx - sx * sx
+        if denominator > 0:
+            slope = (n * sxy - sx * sy) / denominator
+            if slope > 0:
+                rates[machine_id] = slope
+    return rates, latest
+
+
+def _next_due(interval, done_hours, current_hours):
+    if done_hours is not None:
+        return done_hours + interval
+    # Never done: the next point of the schedule.
+    return max(1, math.ceil(current_hours / interval)) * interval
+
+
+def build_forecast(today):
+    intervals = dict(MaintenanceType.objects.filter(interval_hours__gt=0).values_list('id', 'interval_hours'))
+    if not intervals:
+        return []
+
+    rates, latest = usage_rates()
+    fleet_rate = median(rates.values()) if rates else None
+    done = defaultdict(dict)
+    for machine_id, type_id, hours in Maintenance.objects.filter(maintenance_type__in=intervals).values(
+            'machine', 'maintenance_type').annotate(hours=Max('operating_time')).values_list(
+            'machine', 'maintenance_type', 'hours'):
+        done[machine_id][type_id] = hours
+
+    horizon = today + datetime.timedelta(days=MAX_DAYS)
+    items = []
+    for machine_id, (date, hours) in latest.items():
+        rate = rates.get(machine_id, fleet_rate)
+        if not rate:
+            continue
+        current_hours = hours + rate * (today - date).days
+        for type_id, interval in intervals.items():
+            due_hours = _next_due(interval, done[machine_id].get(type_id), current_hours)
+            days = (due_hours - hours) / rate
+            if days > (horizon - date).days:
+                continue
+            items.append({
+                'machine_id': machine_id,
+                'maintenance_type_id': type_id,
+                'due_date': date + datetime.timedelta(days=math.floor(days)),
+                'due_operating_time': due_hours,
+                'estimated_operating_time': round(current_hours),
+                'usage_rate': round(rate, 2),
+                'estimated': machine_id not in rates,
+            })
+    items.sort(key=lambda item: (item['due_date'], item['machine_id'], item['maintenance_type_id']))
+    return items
+
+
+def fleet_forecast(today):
+    versions = get_versions((MaintenanceType,))
+    key = f'forecast:{today.isoformat()}:{latest_version()}:{versions[MaintenanceType._meta.label_lower]}'
+    items = cache.get(key)
+    if items is None:
+        items = build_forecast(today)
+        cache.set(key, items, CACHE_TIMEOUT)
+    return items
+
+
+def due_within(scope, days):
+    today = timezone.localdate()
+    until = today + datetime.timedelta(days=days)
+    items = fleet_forecast(today)
+
+    visible = None
+    if scope.role != MANAGER:
+        visible = set(scope_queryset(Machine.objects.all(), scope).values_list('id', flat=True))
+    return [
+        {**item, 'overdue': item['due_date'] < today}
+        for item in items
+        if item['due_date'] <= until and (visible is None or item['machine_id'] in visible)
+    ]
@@ -0,0 +1,271 @@
+import datetime
+import json
+import re
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+MAX_BLOCK_SIZE = 1000
+
+# Grid column -> (ORM path of the value, ORM path of the label used by text filters and sorting)
+MACHINE_COLUMNS = {
+    'id': ('id', None),
+    'serial_number': ('serial_number', None),
+    'model_id': ('model', 'model__name'),
+    'engine_model_id': ('engine_model', 'engine_model__name'),
+    'engine_serial_number': ('engine_serial_number', None),
+    'transmission_model_id': ('transmission_model', 'transmission_model__name'),
+    'transmission_serial_number': ('transmission_serial_number', None),
+    'drive_axle_model_id': ('drive_axle_model', 'drive_axle_model__name'),
+    'drive_axle_serial_number': ('drive_axle_serial_number', None),
+    'steering_axle_model_id': ('steering_axle_model', 'steering_axle_model__name'),
+    'steering_axle_serial_number': ('steering_axle_serial_number', None),
+    'shipment_date': ('shipment_date', None),
+    'consignee': ('consignee', None),
+    'delivery_address': ('delivery_address', None),
+    'equipment': ('equipment', None),
+    'service_company_id': ('service_company', 'service_company__name'),
+    'client_id': ('client', 'client__first_name'),
+    'last_maintenance_date': ('stats__last_maintenance_date', None),
+    'last_maintenance_operating_time': ('stats__last_maintenance_operating_time', None),
+    'claim_count': ('stats__claim_count', None),
+    'total_downtime': ('stats__total_downtime', None),
+}
+
+MAINTENANCE_COLUMNS = {
+    'id': ('id', None),
+    'machine_id': ('machine', 'machine__serial_number'),
+    'maintenance_type_id': ('maintenance_type', 'maintenance_type__name'),
+    'maintenance_date': ('maintenance_date', None),
+    'operating_time': ('operating_time', None),
+    'order_number': ('order_number', None),
+    'order_date': ('order_date', None),
+    'organization_id': ('organization', 'organization__name'),
+}
+
+CLAIM_COLUMNS = {
+    'id': ('id', None),
+    'machine_id': ('machine', 'machine__serial_number'),
+    'failure_date': ('failure_date', None),
+    'operating_time': ('operating_time', None),
+    'failure_node_id': ('failure_node', 'failure_node__name'),
+    'failure_description': ('failure_description', None),
+    'recovery_method_id': ('recovery_method', 'recovery_method__name'),
+    'spare_parts_used': ('spare_parts_used', None),
+    'recovery_date': ('recovery_date', None),
+}
+
+TEXT_LOOKUPS = {
+    'contains': ('icontains', False),
+    'notContains': ('icontains', True),
+    'equals': ('iexact', False),
+    'notEqual': ('iexact', True),
+    'startsWith': ('istartswith', False),
+    'endsWith': ('iendswith', False),
+}
+
+VALUE_LOOKUPS = {
+    'equals': ('exact', False),
+    'notEqual': ('exact', True),
+    'lessThan': ('lt', False),
+    'lessThanOrEqual': ('lte', False),
+    'greaterThan': ('gt', False),
+    'greaterThanOrEqual': ('gte', False),
+}
+
+
+class GridRequestError(ValueError):
+    pass
+
+
+def _snake_case(col_id):
+    return re.sub(r'(?<!^)(?=[A-Z])', '_', col_id).lower()
+
+
+def _column(columns, col_id):
+    column = columns.get(_snake_case(str(col_id)))
+    if column is None:
+        raise GridRequestError(f"Неизвестная колонка: {col_id}")
+    return column
+
+
+def _json_param(params, name, default):
+    value = params.get(name)
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError:
+        raise GridRequestError(f"Некорректный параметр {name}")
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(str(value)[:10])
+    except ValueError:
+        raise GridRequestError(f"Некорректная дата: {value}")
+
+
+def _blank(path, negate):
+    condition = Q(**{f'{path}__isnull': True}) | Q(**{path: ''})
+    return ~condition if negate else condition
+
+
+def _field(model_class, path):
+    field = None
+    for name in path.split('__'):
+        field = model_class._meta.get_field(name)
+        if field.is_relation:
+            model_class = field.related_model
+    return field
+
+
+def _value(field, value):
+    # Filter values arrive as JSON; convert them the way the column's own field would, or reject them.
+    if value is None or isinstance(value, (dict, list)):
+        raise GridRequestError("Не указано значение фильтра")
+    try:
+        return field.to_python(value)
+    except (ValidationError, TypeError, ValueError):
+        raise GridRequestError(f"Некорректное значение фильтра: {value}")
+
+
+def _text(value):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise GridRequestError("Не указано значение фильтра")
+    return str(value)
+
+
+def _condition(model_class, column, model):
+    value_path, label_path = column
+    filter_type = model.get('filterType')
+    condition_type = model.get('type')
+
+    if filter_type == 'set':
+        values = model.get('values') or []
+        if not isinstance(values, list):
+            raise GridRequestError("Некорректный параметр filterModel")
+        field = _field(model_class, value_path)
+        condition = Q(**{f'{value_path}__in': [_value(field, value) for value in values if value is not None]})
+        if None in values:
+            condition |= Q(**{f'{value_path}__isnull': True})
+        return condition
+
+    if filter_type == 'text':
+        path = label_path or value_path
+        if condition_type in ('blank', 'notBlank'):
+            return _blank(path, condition_type == 'notBlank')
+        if condition_type not in TEXT_LOOKUPS:
+            raise GridRequestError(f"Неизвестный тип фильтра: {condition_type}")
+        lookup, negate = TEXT_LOOKUPS[condition_type]
+        condition = Q(**{f'{path}__{lookup}': _text(model.get('filter'))})
+        return ~condition if negate else condition
+
+    if filter_type in ('number', 'date'):
+        if condition_type in ('blank', 'notBlank'):
+            condition = Q(**{f'{value_path}__isnull': True})
+            return ~condition if condition_type == 'notBlank' else condition
+
+        if filter_type == 'date':
+            value, value_to = model.get('dateFrom'), model.get('dateTo')
+            value = _date(value) if value else None
+            value_to = _date(value_to) if value_to else None
+        else:
+            field = _field(model_class, value_path)
+            value, value_to = model.get('filter'), model.get('filterTo')
+            value = _value(field, value) if value is not None else None
+            value_to = _value(field, value_to) if value_to is not None else None
+
+        if value is None or (condition_type == 'inRange' and value_to is None):
+            raise GridRequestError("Не указано значение фильтра")
+        if condition_type == 'inRange':
+            return Q(**{f'{value_path}__gte': value, f'{value_path}__lte': value_to})
+        if condition_type not in VALUE_LOOKUPS:
+            raise GridRequestError(f"Неизвестный тип фильтра: {condition_type}")
+        lookup, negate = VALUE_LOOKUPS[condition_type]
+        condition = Q(**{f'{value_path}__{lookup}': value})
+        return ~condition if negate else condition
+
+    raise GridRequestError(f"Неизвестный тип фильтра: {filter_type}")
+
+
+def _column_filter(model_class, column, model):
+    if not isinstance(model, dict):
+        raise GridRequestError("Некорректный параметр filterModel")
+
+    conditions = model.get('conditions')
+    if conditions is None and 'condition1' in model:
+        conditions = [model['condition1'], model['condition2']]
+    if conditions is None:
+        return _condition(model_class, column, model)
+
+    combined = Q()
+    for condition in conditions:
+        if not isinstance(condition, dict):
+            raise GridRequestError("Некорректный параметр filterModel")
+        condition = _condition(model_class, column, {'filterType': model.get('filterType'), **condition})
+        if model.get('operator') == 'OR':
+            combined |= condition
+        else:
+            combined &= condition
+    return combined
+
+
+def apply_filter_model(queryset, columns, filter_model):
+    if not isinstance(filter_model, dict):
+        raise GridRequestError("Некорректный параметр filterModel")
+
+    for col_id, model in filter_model.items():
+        queryset = queryset.filter(_column_filter(queryset.model, _column(columns, col_id), model))
+    return queryset
+
+
+def apply_sort_model(queryset, columns, sort_model):
+    if not isinstance(sort_model, list):
+        raise GridRequestError("Некорректный параметр sortModel")
+
+    ordering = []
+    for item in sort_model:
+        if not isinstance(item, dict):
+            raise GridRequestError("Некорректный параметр sortModel")
+        value_path, label_path = _column(columns, item.get('colId'))
+        prefix = '-' if item.get('sort') == 'desc' else ''
+        ordering.append(f'{prefix}{label_path or value_path}')
+
+    if not ordering:
+        return queryset.order_by(*queryset.query.order_by, 'id')
+    return queryset.order_by(*ordering, 'id')
+
+
+def get_block(queryset, columns, params):
+    try:
+        start_row = max(int(params.get('startRow', 0)), 0)
+        end_row = int(params.get('endRow', start_row + 100))
+    except ValueError:
+        raise GridRequestError("Некорректные параметры startRow/endRow")
+    end_row = min(max(end_row, start_row), start_row + MAX_BLOCK_SIZE)
+
+    queryset = apply_filter_model(queryset, columns, _json_param(params, 'filterModel', {}))
+    queryset = apply_sort_model(queryset, columns, _json_param(params, 'sortModel', []))
+
+    return queryset[start_row:end_row], queryset.count()
+
+
+class ServerSideRowModelMixin:
+    grid_columns = None
+    list_serializer_class = None
+
+    @action(detail=False, methods=['get'])
+    def rows(self, request):
+        try:
+            rows, row_count = get_block(self.get_queryset(), self.grid_columns, request.query_params)
+        except GridRequestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'rowData': self.list_serializer_class(rows, many=True).data,
+            'rowCount': row_count
+        })
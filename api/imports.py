@@ -0,0 +1,350 @@
+import csv
+import datetime
+import io
+import time
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from django.contrib.auth.models import User
+from django.db import transaction, IntegrityError
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.response import Response
+
+from .exports import MachineExport, MaintenanceExport, ClaimExport, CSV, XLSX, FORMATS
+from .models import Machine, Maintenance, Claim, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
+    DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod, normalize_serial
+from .serializers import MachineSerializer, MaintenanceSerializer, ClaimSerializer
+from .signals import bulk_saved
+
+BATCH_SIZE = 1000
+MAX_REPORTED_REJECTS = 100
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+EXCEL_EPOCH = datetime.date(1899, 12, 30)
+
+
+def reference_ids(model):
+    return {name.strip().upper(): pk for pk, name in model.objects.values_list('id', 'name').iterator()}
+
+
+def client_ids():
+    ids, ambiguous = {}, set()
+    for pk, username, first_name, service_company in User.objects.values_list(
+            'id', 'username', 'first_name', 'service_company__name').iterator():
+        for name in {service_company, first_name} - {None, ''}:
+            key = name.strip().upper()
+            if key in ids and ids[key] != pk:
+                ambiguous.add(key)
+            ids[key] = pk
+    for key in ambiguous:
+        del ids[key]
+    # Usernames are unique, so they win over display names.
+    ids.update({username.strip().upper(): pk for pk, username in User.objects.values_list('id', 'username')})
+    return ids
+
+
+def machine_ids():
+    return {normalize_serial(serial): pk for pk, serial in Machine.objects.values_list('id', 'serial_number').iterator()}
+
+
+def _date(value):
+    value = str(value).strip()
+    try:
+        return (EXCEL_EPOCH + datetime.timedelta(days=int(float(value)))).isoformat()
+    except (ValueError, OverflowError):
+        pass
+    try:
+        return datetime.datetime.strptime(value[:10], '%d.%m.%Y').date().isoformat()
+    except ValueError:
+        return value[:10]
+
+
+def _integer(value):
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return int(number) if number.is_integer() else value
+
+
+def read_csv(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    sample = text.read(4096)
+    text.seek(0)
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+    except csv.Error:
+        dialect = csv.excel
+    yield from csv.reader(text, dialect)
+
+
+def read_xlsx(file):
+    with zipfile.ZipFile(file) as workbook:
+        names = workbook.namelist()
+        shared_strings = []
+        if 'xl/sharedStrings.xml' in names:
+            with workbook.open('xl/sharedStrings.xml') as strings:
+                for _, element in iterparse(strings):
+                    if element.tag == f'{SPREADSHEET_NS}si':
+                        shared_strings.append(''.join(text.text or '' for text in element.iter(f'{SPREADSHEET_NS}t')))
+                        element.clear()
+
+        sheet = sorted(name for name in names if name.startswith('xl/worksheets/') and name.endswith('.xml'))[0]
+        with workbook.open(sheet) as rows:
+            for _, element in iterparse(rows):
+                if element.tag != f'{SPREADSHEET_NS}row':
+                    continue
+                row = {}
+                for position, cell in enumerate(element.iter(f'{SPREADSHEET_NS}c')):
+                    reference = cell.get('r')
+                    column = position
+                    if reference:
+                        letters = reference.rstrip('0123456789')
+                        column = 0
+                        for letter in letters:
+                            column = column * 26 + ord(letter) - ord('A') + 1
+                        column -= 1
+                    if cell.get('t') == 'inlineStr':
+                        value = ''.join(text.text or '' for text in cell.iter(f'{SPREADSHEET_NS}t'))
+                    else:
+                        value = cell.findtext(f'{SPREADSHEET_NS}v') or ''
+                        if cell.get('t') == 's' and value:
+                            value = shared_strings[int(value)]
+                    row[column] = value
+                element.clear()
+                yield [row.get(column, '') for column in range(max(row, default=-1) + 1)]
+
+
+class Import:
+    model = None
+    serializer_class = None
+    export_class = None
+    # Foreign key column -> callable building a {NAME: id} lookup, loaded once per import.
+    lookups = {}
+    date_fields = ()
+    integer_fields = ()
+    service_company_from_machine = False
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.timings = {'parse': 0.0, 'validate': 0.0, 'write': 0.0}
+        self.rows = 0
+        self.created = 0
+        self.rejects = []
+        self.rejected = 0
+
+    def columns(self, header):
+        names = {}
+        for field in self.export_class.fields:
+            names[field.upper()] = field
+            names[str(self.model._meta.get_field(field).verbose_name).upper()] = field
+        return [names.get(str(title).strip().upper()) for title in header]
+
+    def reject(self, line, errors):
+        self.rejected += 1
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append({'line': line, 'errors': errors})
+
+    def convert(self, line, values, lookups):
+        item, errors = {}, {}
+        for field, value in values.items():
+            value = str(value).strip()
+            if field in lookups:
+                if not value or (field == 'organization' and value == Maintenance.SELF_SERVICE):
+                    item[field] = None
+                elif value.upper() in lookups[field]:
+                    item[field] = lookups[field][value.upper()]
+                else:
+                    errors[field] = [f"Значение «{value}» не найдено в справочнике"]
+            elif field in self.date_fields:
+                item[field] = _date(value) if value else None
+            elif field in self.integer_fields:
+                item[field] = _integer(value) if value else None
+            else:
+                item[field] = value
+        if errors:
+            self.reject(line, errors)
+            return None
+        return item
+
+    def prepare(self, items):
+        if not self.service_company_from_machine:
+            return items
+        service_companies = dict(Machine.objects.filter(
+            id__in=[item['machine'] for item in items if item.get('machine')]
+        ).values_list('id', 'service_company_id'))
+        for item in items:
+            if not item.get('service_company') and item.get('machine') in service_companies:
+                item['service_company'] = service_companies[item['machine']]
+        return items
+
+    def build(self, data):
+        instance = self.model(**data)
+        if self.model is Machine:
+            instance.serial_number_normalized = normalize_serial(instance.serial_number)
+        return instance
+
+    def write(self, lines, instances):
+        using = self.model.objects.db
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(instances)
+                bulk_saved.send(sender=self.model, instances=instances, created=True, using=using)
+                self.created += len(instances)
+                return
+        except IntegrityError:
+            pass
+
+        # A constraint failed somewhere in the chunk: retry row by row to find the offenders.
+        for line, instance in zip(lines, instances):
+            try:
+                with transaction.atomic():
+                    self.model.objects.bulk_create([instance])
+                    bulk_saved.send(sender=self.model, instances=[instance], created=True, using=using)
+                    self.created += 1
+            except IntegrityError as e:
+                self.reject(line, {'non_field_errors': [str(e)]})
+
+    def process(self, batch):
+        started = time.monotonic()
+        lines = [line for line, _ in batch]
+        items = self.prepare([item for _, item in batch])
+        serializer = self.serializer_class(data=items, many=True)
+        if not serializer.is_valid():
+            valid = []
+            for line, item, errors in zip(lines, items, serializer.errors):
+                if errors:
+                    self.reject(line, errors)
+                else:
+                    valid.append((line, item))
+            lines = [line for line, _ in valid]
+            serializer = self.serializer_class(data=[item for _, item in valid], many=True)
+            serializer.is_valid()
+        instances = [self.build(data) for data in serializer.validated_data] if lines else []
+        self.timings['validate'] += time.monotonic() - started
+
+        started = time.monotonic()
+        if instances:
+            self.write(lines, instances)
+        self.timings['write'] += time.monotonic() - started
+
+    def run(self, file, file_format):
+        started = time.monotonic()
+        lookups = {field: load() for field, load in self.lookups.items()}
+        rows = read_xlsx(file) if file_format == XLSX else read_csv(file)
+
+        parse_started = time.monotonic()
+        header = next(rows, [])
+        columns = self.columns(header)
+        batch = []
+        for line, row in enumerate(rows, 2):
+            if not any(str(value).strip() for value in row):
+                continue
+            self.rows += 1
+            item = self.convert(line, {field: value for field, value in zip(columns, row) if field}, lookups)
+            if item is not None:
+                batch.append((line, item))
+            if len(batch) >= self.batch_size:
+                self.timings['parse'] += time.monotonic() - parse_started
+                self.process(batch)
+                batch = []
+                parse_started = time.monotonic()
+        self.timings['parse'] += time.monotonic() - parse_started
+        if batch:
+            self.process(batch)
+
+        return self.report(time.monotonic() - started)
+
+    def report(self, seconds):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'rejected': self.rejected,
+            'rejects': sorted(self.rejects, key=lambda reject: reject['line']),
+            'seconds': round(seconds, 3),
+            'rows_per_second': round(self.rows / seconds, 1) if seconds else None,
+            'timings': {stage: round(value, 3) for stage, value in self.timings.items()},
+        }
+
+
+class MachineImport(Import):
+    model = Machine
+    serializer_class = MachineSerializer
+    export_class = MachineExport
+    lookups = {
+        'model': lambda: reference_ids(MachineModel),
+        'engine_model': lambda: reference_ids(EngineModel),
+        'transmission_model': lambda: reference_ids(TransmissionModel),
+        'drive_axle_model': lambda: reference_ids(DriveAxleModel),
+        'steering_axle_model': lambda: reference_ids(SteeringAxleModel),
+        'client': client_ids,
+        'service_company': lambda: reference_ids(ServiceCompany),
+    }
+    date_fields = ('shipment_date',)
+
+
+class MaintenanceImport(Import):
+    model = Maintenance
+    serializer_class = MaintenanceSerializer
+    export_class = MaintenanceExport
+    lookups = {
+        'machine': machine_ids,
+        'maintenance_type': lambda: reference_ids(MaintenanceType),
+        'organization': lambda: reference_ids(ServiceCompany),
+        'service_company': lambda: reference_ids(ServiceCompany),
+    }
+    date_fields = ('maintenance_date', 'order_date')
+    integer_fields = ('operating_time',)
+    service_company_from_machine = True
+
+
+class ClaimImport(Import):
+    model = Claim
+    serializer_class = ClaimSerializer
+    export_class = ClaimExport
+    lookups = {
+        'machine': machine_ids,
+        'failure_node': lambda: reference_ids(FailureNode),
+        'recovery_method': lambda: reference_ids(RecoveryMethod),
+        'service_company': lambda: reference_ids(ServiceCompany),
+    }
+    date_fields = ('failure_date', 'recovery_date')
+    integer_fields = ('operating_time',)
+    service_company_from_machine = True
+
+
+IMPORTS = {
+    'machines': MachineImport,
+    'maintenances': MaintenanceImport,
+    'claims': ClaimImport,
+}
+
+
+def detect_format(name):
+    return XLSX if str(name).lower().endswith('.xlsx') else CSV
+
+
+class ImportMixin:
+    import_class = None
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_file(self, request):
+        file = request.FILES.get('file')
+        if file is None:
+            return Response({"error": "Необходимо приложить файл"}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_format = request.data.get('file_format') or detect_format(file.name)
+        if file_format not in FORMATS:
+            return Response(
+                {"error": f"Неподдерживаемый формат файла: {file_format}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            report = self.import_class().run(file, file_format)
+        except (zipfile.BadZipFile, UnicodeDecodeError, IndexError, SyntaxError):
+            return Response({"error": "Не удалось прочитать файл"}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
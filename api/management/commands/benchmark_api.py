@@ -0,0 +1,44 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import ENDPOINTS, REPEAT, compare, run
+
+
+class Command(BaseCommand):
+    help = 'Замер времени ответа, числа запросов и размера ответа основных эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=REPEAT)
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS), dest='endpoints')
+        parser.add_argument('--accept-encoding', default='')
+        parser.add_argument('--output')
+        parser.add_argument('--compare', dest='baseline')
+
+    def handle(self, *args, repeat, endpoints, accept_encoding, output, baseline, **options):
+        if repeat < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        report = run(repeat=repeat, names=endpoints, accept_encoding=accept_encoding)
+
+        self.stdout.write(f'{"endpoint":<40} {"status":>6} {"queries":>7} {"bytes":>10} '
+                          f'{"first":>9} {"p50":>9} {"p90":>9} {"p99":>9}')
+        for key, result in report['results'].items():
+            self.stdout.write(f'{key:<40} {result["status"]:>6} {result["queries"]:>7} {result["bytes"]:>10} '
+                              f'{result["first_ms"]:>9} {result["p50_ms"]:>9} {result["p90_ms"]:>9} '
+                              f'{result["p99_ms"]:>9}')
+
+        if baseline:
+            try:
+                with open(baseline, encoding='utf-8') as file:
+                    rows = compare(report, json.load(file))
+            except (OSError, ValueError) as e:
+                raise CommandError(e)
+            self.stdout.write('')
+            for key, before, after, change, queries_before, queries_after in rows:
+                self.stdout.write(f'{key:<40} {before:>9} -> {after:>9} ms ({change:+.1f}%), '
+                                  f'запросов {queries_before} -> {queries_after}')
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Отчёт сохранён в {output}')
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import compare_concurrency, concurrency
+from api.models import Machine
+
+
+class Command(BaseCommand):
+    help = 'Замер пропускной способности базы данных при параллельном чтении и записи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, action='append')
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--write-share', type=float, default=0.2)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output')
+        parser.add_argument('--compare', dest='baseline')
+
+    def handle(self, *args, threads, seconds, write_share, seed, output, baseline, **options):
+        threads = threads or [1, 4, 16]
+        if min(threads) < 1 or seconds <= 0:
+            raise CommandError('--threads и --seconds должны быть больше нуля')
+        if not 0 <= write_share <= 1:
+            raise CommandError('--write-share должен быть от 0 до 1')
+        if not Machine.objects.exists():
+            raise CommandError('В базе нет машин, сначала выполните generate_fleet')
+
+        report = concurrency(threads=threads, seconds=seconds, write_share=write_share, seed=seed)
+
+        self.stdout.write(', '.join(f'{name}={value}' for name, value in report['meta']['database'].items()))
+        self.stdout.write(f'{"threads":<12} {"reads/s":>9} {"read p99":>9} {"writes/s":>9} {"write p99":>9} '
+                          f'{"errors":>7}')
+        for key, result in report['results'].items():
+            reads, writes = result['reads'], result['writes']
+            self.stdout.write(f'{key:<12} {reads["per_second"]:>9} {str(reads["p99_ms"]):>9} '
+                              f'{writes["per_second"]:>9} {str(writes["p99_ms"]):>9} {result["errors"]:>7}')
+
+        if baseline:
+            try:
+                with open(baseline, encoding='utf-8') as file:
+                    rows = compare_concurrency(report, json.load(file))
+            except (OSError, ValueError) as e:
+                raise CommandError(e)
+            self.stdout.write('')
+            for key, kind, before, after in rows:
+                self.stdout.write(f'{key:<12} {kind:<7} {before:>9} -> {after:>9}')
+
+        if output:
+            with open(output, 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Отчёт сохранён в {output}')
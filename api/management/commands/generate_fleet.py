@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import Machine
+from api.synthetic import BATCH_SIZE, FleetGenerator
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетического парка машин с ТО и рекламациями для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--machines', type=int, default=1000)
+        parser.add_argument('--maintenances', type=int, default=None,
+                            help='Всего ТО (по умолчанию 10 на машину)')
+        parser.add_argument('--claims', type=int, default=None,
+                            help='Всего рекламаций (по умолчанию 2 на машину)')
+        parser.add_argument('--service-companies', type=int, default=20)
+        parser.add_argument('--clients', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--prefix', default='SYN')
+        parser.add_argument('--password', default='password')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, machines, maintenances, claims, service_companies, clients, seed, prefix, password,
+               batch_size, **options):
+        if min(service_companies, clients) < 1 or machines < 0:
+            raise CommandError('Нужна хотя бы одна сервисная компания и один клиент')
+        if Machine.objects.filter(serial_number__startswith=prefix).exists():
+            raise CommandError(f'Данные с префиксом {prefix} уже существуют')
+
+        started = time.monotonic()
+        counts = FleetGenerator(prefix=prefix, password=password, seed=seed, batch_size=batch_size).run(
+            machines=machines,
+            maintenances=machines * 10 if maintenances is None else maintenances,
+            claims=machines * 2 if claims is None else claims,
+            service_companies=service_companies,
+            clients=clients,
+        )
+        for name, count in counts.items():
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(f'Готово за {time.monotonic() - started:.2f} с')
@@ -0,0 +1,25 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import FORMATS
+from api.imports import IMPORTS, BATCH_SIZE, detect_format
+
+
+class Command(BaseCommand):
+    help = 'Импорт машин, ТО или рекламаций из CSV/XLSX файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(IMPORTS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS, dest='file_format')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, table, path, file_format, batch_size, **options):
+        try:
+            with open(path, 'rb') as file:
+                report = IMPORTS[table](batch_size=batch_size).run(file, file_format or detect_format(path))
+        except OSError as e:
+            raise CommandError(e)
+
+        self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
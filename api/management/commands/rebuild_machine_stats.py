@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.stats import BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт сводной статистики по машинам (последнее ТО, рекламации, простой)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        started = time.monotonic()
+        count = rebuild(batch_size=batch_size)
+        self.stdout.write(f'Пересчитано машин: {count} за {time.monotonic() - started:.2f} с')
@@ -0,0 +1,173 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.utils.deprecation import MiddlewareMixin
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Metric name -> (help, index in the per-endpoint totals)
+METRICS = {
+    'silant_http_requests_total': ('Обработанные запросы', 0),
+    'silant_http_request_seconds_total': ('Суммарное время обработки запросов', 1),
+    'silant_db_queries_total': ('Выполненные SQL-запросы', 2),
+    'silant_db_seconds_total': ('Суммарное время SQL-запросов', 3),
+    'silant_serialize_seconds_total': ('Суммарное время сериализации ответов', 4),
+    'silant_response_bytes_total': ('Отправленные байты ответов', 5),
+    'silant_query_budget_exceeded_total': ('Превышения бюджета SQL-запросов', 6),
+}
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = defaultdict(lambda: [0] * len(METRICS))
+
+    def add(self, labels, values):
+        with self.lock:
+            totals = self.totals[labels]
+            for index, value in enumerate(values):
+                totals[index] += value
+
+    def clear(self):
+        with self.lock:
+            self.totals.clear()
+
+    def render(self):
+        with self.lock:
+            totals = {labels: list(values) for labels, values in self.totals.items()}
+        lines = []
+        for name, (description, index) in METRICS.items():
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} counter')
+            for (endpoint, method, status), values in sorted(totals.items()):
+                lines.append(f'{name}{{endpoint="{endpoint}",method="{method}",status="{status}"}} '
+                             f'{round(values[index], 6)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = _Registry()
+
+
+class _QueryCollector:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class _RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = _QueryCollector()
+        self.connections = list(connections.all())
+        self.render_started = None
+        self.serialize = 0.0
+        for connection in self.connections:
+            connection.execute_wrappers.append(self.queries)
+
+    def rendered(self, response):
+        self.serialize += time.perf_counter() - self.render_started
+
+    def stop(self):
+        for connection in self.connections:
+            if self.queries in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self.queries)
+        return time.perf_counter() - self.started
+
+
+@contextmanager
+def serializing(request):
+    # Serializer work done in the view counts as `serialize` rather than `app`; the SQL it runs stays under `db`.
+    state = getattr(request, '_metrics', None)
+    if state is None:
+        yield
+        return
+    started, db = time.perf_counter(), state.queries.seconds
+    try:
+        yield
+    finally:
+        state.serialize += max(time.perf_counter() - started - (state.queries.seconds - db), 0)
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.url_name or match.view_name
+
+
+def over_budget(endpoint, queries):
+    budget = settings.QUERY_BUDGETS.get(endpoint)
+    if budget is None or queries <= budget:
+        return None
+    return f'{endpoint}: {queries} SQL-запросов при бюджете {budget}'
+
+
+class MetricsMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        request._metrics = _RequestMetrics()
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after the outermost middleware returns them from here.
+        state = getattr(request, '_metrics', None)
+        if state is not None:
+            state.render_started = time.perf_counter()
+            response.add_post_render_callback(state.rendered)
+        return response
+
+    def process_response(self, request, response):
+        state = getattr(request, '_metrics', None)
+        if state is None:
+            return response
+        total = state.stop()
+        endpoint = endpoint_name(request)
+        queries = state.queries.count
+        db = state.queries.seconds
+        size = 0 if response.streaming else len(response.content)
+
+        # Timings and query counts describe the backend, so anonymous clients do not get them.
+        user = getattr(request, 'user', None)
+        if settings.DEBUG or (user is not None and user.is_staff):
+            response.headers['Server-Timing'] = ', '.join((
+                f'db;dur={db * 1000:.1f};desc="{queries} queries"',
+                f'app;dur={max(total - db - state.serialize, 0) * 1000:.1f}',
+                f'serialize;dur={state.serialize * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ))
+        exceeded = over_budget(endpoint, queries)
+        registry.add((endpoint, request.method, response.status_code),
+                     (1, total, queries, db, state.serialize, size, int(exceeded is not None)))
+        if exceeded:
+            if settings.QUERY_BUDGETS_STRICT:
+                raise QueryBudgetExceeded(exceeded)
+            logger.warning(exceeded)
+        return response
+
+
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    allowed = request.user.is_staff or (token and constant_time_compare(authorization, f'Bearer {token}'))
+    if not allowed:
+        return JsonResponse({"error": "Доступ запрещен"}, status=403)
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
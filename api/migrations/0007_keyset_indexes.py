@@ -0,0 +1,25 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_alter_servicecompany_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='claim',
+            index=models.Index(fields=['failure_date', 'id'], name='claim_failure_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='machine',
+            index=models.Index(fields=['shipment_date', 'id'], name='machine_shipment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='maintenance',
+            index=models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:36
+
+from django.db import migrations, models, OperationalError
+
+
+def populate_serial_number_normalized(apps, schema_editor):
+    Machine = apps.get_model('api', 'Machine')
+    machines = list(Machine.objects.using(schema_editor.connection.alias).only('id', 'serial_number'))
+    for machine in machines:
+        machine.serial_number_normalized = (machine.serial_number or '').strip().upper()
+    Machine.objects.using(schema_editor.connection.alias).bulk_update(machines, ['serial_number_normalized'],
+                                                                      batch_size=1000)
+
+
+def create_substring_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE api_machine_serial_fts USING fts5(serial, tokenize='trigram')"
+            )
+        except OperationalError:
+            # SQLite built without FTS5 or older than 3.34: search falls back to a LIKE scan.
+            return
+        schema_editor.execute(
+            "INSERT INTO api_machine_serial_fts (rowid, serial) SELECT id, serial_number_normalized FROM api_machine"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        schema_editor.execute(
+            "CREATE INDEX api_machine_serial_trgm_idx ON api_machine "
+            "USING gin (serial_number_normalized gin_trgm_ops)"
+        )
+
+
+def drop_substring_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS api_machine_serial_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS api_machine_serial_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='machine',
+            name='serial_number_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=255, verbose_name='Заводской номер для поиска'),
+        ),
+        migrations.RunPython(populate_serial_number_normalized, migrations.RunPython.noop),
+        migrations.RunPython(create_substring_index, drop_substring_index),
+    ]
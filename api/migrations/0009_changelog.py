@@ -0,0 +1,30 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_machine_serial_number_normalized'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('table', models.CharField(choices=[('machine', 'Машина'), ('maintenance', 'Техническое обслуживание'), ('claim', 'Рекламация')], max_length=20, verbose_name='Таблица')),
+                ('object_id', models.BigIntegerField(verbose_name='Идентификатор записи')),
+                ('action', models.CharField(choices=[('upsert', 'Создание или изменение'), ('delete', 'Удаление')], max_length=10, verbose_name='Действие')),
+                ('service_company_id', models.BigIntegerField(null=True, verbose_name='Сервисная компания')),
+                ('client_id', models.BigIntegerField(null=True, verbose_name='Клиент')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Время изменения')),
+            ],
+            options={
+                'verbose_name': 'Журнал изменений',
+                'verbose_name_plural': 'Журнал изменений',
+                'indexes': [models.Index(fields=['service_company_id', 'id'], name='changelog_company_id_idx'), models.Index(fields=['client_id', 'id'], name='changelog_client_id_idx')],
+            },
+        ),
+    ]
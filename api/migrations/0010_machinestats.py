@@ -0,0 +1,53 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:51
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_machine_stats(apps, schema_editor):
+    alias = schema_editor.connection.alias
+    Machine = apps.get_model('api', 'Machine')
+    Maintenance = apps.get_model('api', 'Maintenance')
+    Claim = apps.get_model('api', 'Claim')
+    MachineStats = apps.get_model('api', 'MachineStats')
+
+    stats = {pk: MachineStats(machine_id=pk) for pk in Machine.objects.using(alias).values_list('pk', flat=True)}
+    for machine_id, date, operating_time in Maintenance.objects.using(alias).order_by(
+            'machine', 'maintenance_date', 'id').values_list('machine', 'maintenance_date', 'operating_time').iterator():
+        row = stats[machine_id]
+        row.last_maintenance_date, row.last_maintenance_operating_time = date, operating_time
+        row.maintenance_count += 1
+    for machine_id, failure_date, recovery_date in Claim.objects.using(alias).values_list(
+            'machine', 'failure_date', 'recovery_date').iterator():
+        row = stats[machine_id]
+        row.claim_count += 1
+        row.total_downtime += (recovery_date - failure_date).days
+        row.last_recovery_date = max(filter(None, (row.last_recovery_date, recovery_date)))
+    MachineStats.objects.using(alias).bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MachineStats',
+            fields=[
+                ('machine', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.machine', verbose_name='Машина')),
+                ('last_maintenance_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего ТО')),
+                ('last_maintenance_operating_time', models.PositiveIntegerField(blank=True, null=True, verbose_name='Наработка на последнем ТО, м/час')),
+                ('maintenance_count', models.PositiveIntegerField(default=0, verbose_name='Количество ТО')),
+                ('claim_count', models.PositiveIntegerField(default=0, verbose_name='Количество рекламаций')),
+                ('total_downtime', models.IntegerField(default=0, verbose_name='Суммарное время простоя, дней')),
+                ('last_recovery_date', models.DateField(blank=True, null=True, verbose_name='Дата последнего восстановления')),
+            ],
+            options={
+                'verbose_name': 'Статистика машины',
+                'verbose_name_plural': 'Статистика машин',
+            },
+        ),
+        migrations.RunPython(populate_machine_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.20 on 2026-10-18 16:54
+
+import re
+
+from django.db import migrations, models
+
+
+def populate_interval_hours(apps, schema_editor):
+    # Type names carry the interval, e.g. "ТО-1 (200 м/час)".
+    MaintenanceType = apps.get_model('api', 'MaintenanceType')
+    for maintenance_type in MaintenanceType.objects.using(schema_editor.connection.alias):
+        match = re.search(r'(\d+)\s*м/час', maintenance_type.name)
+        if match:
+            maintenance_type.interval_hours = int(match.group(1))
+            maintenance_type.save(update_fields=['interval_hours'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_machinestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maintenancetype',
+            name='interval_hours',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Периодичность, м/час'),
+        ),
+        migrations.RunPython(populate_interval_hours, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.20 on 2026-10-18 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_maintenancetype_interval_hours'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='claim',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='machine',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия записи'),
+        ),
+        migrations.AddField(
+            model_name='maintenance',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False, verbose_name='Версия записи'),
+        ),
+    ]
@@ -2,6 +2,21 @@ from django.db import models
 from django.contrib.auth.models import User
 
 
+def normalize_serial(value):
+    return (value or '').strip().upper()
+
+
+class RowVersionMixin:
+    # Every update of a row bumps its version; it is the ETag of the detail endpoints.
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            self.version += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'version'}
+        super().save(*args, **kwargs)
+
+
 class BaseReference(models.Model):
     name = models.CharField(max_length=255, unique=True, verbose_name="Название")
     description = models.TextField(blank=True, null=True, verbose_name="Описание")
@@ -44,6 +59,8 @@ class SteeringAxleModel(BaseReference):
 
 
 class MaintenanceType(BaseReference):
+    interval_hours = models.PositiveIntegerField(null=True, blank=True, verbose_name="Периодичность, м/час")
+
     class Meta:
         verbose_name = "Вид ТО"
         verbose_name_plural = "Виды ТО"
@@ -76,7 +93,7 @@ class ServiceCompany(models.Model):
         verbose_name_plural = "Сервисные компании"
 
 
-class Machine(models.Model):
+class Machine(RowVersionMixin, models.Model):
     serial_number = models.CharField(max_length=255, unique=True, verbose_name="Заводской номер машины")
     model = models.ForeignKey(MachineModel, on_delete=models.PROTECT, verbose_name="Модель техники")
     engine_model = models.ForeignKey(EngineModel, on_delete=models.PROTECT, verbose_name="Модель двигателя")
@@ -96,6 +113,16 @@ class Machine(models.Model):
     equipment = models.TextField(blank=True, null=True, verbose_name="Комплектация (доп. опции)")
     client = models.ForeignKey(User, on_delete=models.PROTECT, related_name='client_machines', verbose_name="Клиент")
     service_company = models.ForeignKey(ServiceCompany, on_delete=models.PROTECT, verbose_name="Сервисная компания")
+    serial_number_normalized = models.CharField(max_length=255, db_index=True, editable=False, default="",
+                                                verbose_name="Заводской номер для поиска")
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Версия записи")
+
+    def save(self, *args, **kwargs):
+        self.serial_number_normalized = normalize_serial(self.serial_number)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'serial_number' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'serial_number_normalized'}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.serial_number}"
@@ -103,9 +130,12 @@ class Machine(models.Model):
     class Meta:
         verbose_name = "Машина"
         verbose_name_plural = "Машины"
+        indexes = [
+            models.Index(fields=['shipment_date', 'id'], name='machine_shipment_date_id_idx'),
+        ]
 
 
-class Maintenance(models.Model):
+class Maintenance(RowVersionMixin, models.Model):
     SELF_SERVICE = "Самостоятельно"
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='maintenances', verbose_name="Машина")
     maintenance_type = models.ForeignKey(MaintenanceType, on_delete=models.PROTECT, verbose_name="Вид ТО")
@@ -124,6 +154,7 @@ class Maintenance(models.Model):
         ServiceCompany, on_delete=models.PROTECT, related_name='service_maintenances',
         verbose_name="Сервисная компания"
     )
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Версия записи")
 
     def get_organization_display(self):
         return self.SELF_SERVICE if self.organization is None else str(self.organization)
@@ -134,9 +165,12 @@ class Maintenance(models.Model):
     class Meta:
         verbose_name = "Техническое обслуживание"
         verbose_name_plural = "Технические обслуживания"
+        indexes = [
+            models.Index(fields=['maintenance_date', 'id'], name='maintenance_date_id_idx'),
+        ]
 
 
-class Claim(models.Model):
+class Claim(RowVersionMixin, models.Model):
     failure_date = models.DateField(verbose_name="Дата отказа")
     operating_time = models.PositiveIntegerField(verbose_name="Наработка, м/час")
     failure_node = models.ForeignKey(FailureNode, on_delete=models.PROTECT, verbose_name="Узел отказа")
@@ -147,6 +181,7 @@ class Claim(models.Model):
     machine = models.ForeignKey(Machine, on_delete=models.CASCADE, related_name='claims', verbose_name="Машина")
     service_company = models.ForeignKey(ServiceCompany, on_delete=models.PROTECT, related_name='service_claims',
                                         verbose_name="Сервисная компания")
+    version = models.PositiveIntegerField(default=1, editable=False, verbose_name="Версия записи")
 
     @property
     def downtime(self):
@@ -158,3 +193,57 @@ class Claim(models.Model):
     class Meta:
         verbose_name = "Рекламация"
         verbose_name_plural = "Рекламации"
+        indexes = [
+            models.Index(fields=['failure_date', 'id'], name='claim_failure_date_id_idx'),
+        ]
+
+
+class MachineStats(models.Model):
+    machine = models.OneToOneField(Machine, on_delete=models.CASCADE, primary_key=True, related_name='stats',
+                                   verbose_name="Машина")
+    last_maintenance_date = models.DateField(null=True, blank=True, verbose_name="Дата последнего ТО")
+    last_maintenance_operating_time = models.PositiveIntegerField(null=True, blank=True,
+                                                                  verbose_name="Наработка на последнем ТО, м/час")
+    maintenance_count = models.PositiveIntegerField(default=0, verbose_name="Количество ТО")
+    claim_count = models.PositiveIntegerField(default=0, verbose_name="Количество рекламаций")
+    total_downtime = models.IntegerField(default=0, verbose_name="Суммарное время простоя, дней")
+    last_recovery_date = models.DateField(null=True, blank=True, verbose_name="Дата последнего восстановления")
+
+    def __str__(self):
+        return f"Статистика {self.machine_id}"
+
+    class Meta:
+        verbose_name = "Статистика машины"
+        verbose_name_plural = "Статистика машин"
+
+
+class ChangeLog(models.Model):
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = [
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    ]
+    TABLE_CHOICES = [
+        ('machine', 'Машина'),
+        ('maintenance', 'Техническое обслуживание'),
+        ('claim', 'Рекламация'),
+    ]
+
+    table = models.CharField(max_length=20, choices=TABLE_CHOICES, verbose_name="Таблица")
+    object_id = models.BigIntegerField(verbose_name="Идентификатор записи")
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, verbose_name="Действие")
+    service_company_id = models.BigIntegerField(null=True, verbose_name="Сервисная компания")
+    client_id = models.BigIntegerField(null=True, verbose_name="Клиент")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время изменения")
+
+    def __str__(self):
+        return f"{self.table} {self.object_id}: {self.action}"
+
+    class Meta:
+        verbose_name = "Журнал изменений"
+        verbose_name_plural = "Журнал изменений"
+        indexes = [
+            models.Index(fields=['service_company_id', 'id'], name='changelog_company_id_idx'),
+            models.Index(fields=['client_id', 'id'], name='changelog_client_id_idx'),
+        ]
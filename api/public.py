@@ -0,0 +1,104 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.throttling import BaseThrottle
+
+from .dictionaries import load_dictionaries, dictionaries_version, MODEL_DICTIONARIES
+from .models import Machine, normalize_serial
+from .renderers import FastJSONRenderer
+from .serializers import MachineLimitedListSerializer
+
+LOOKUP_KEY = 'public_info:{}'
+BUCKET_KEY = 'public_info:bucket:{}'
+FOUND_TIMEOUT = 60 * 60 * 24
+NOT_FOUND_TIMEOUT = 60 * 10
+LOCK_ATTEMPTS = 20
+LOCK_WAIT = 0.005
+LOCK_TIMEOUT = 1
+
+_renderer = FastJSONRenderer()
+_blobs = {}
+
+
+def _key(term):
+    return LOOKUP_KEY.format(hashlib.md5(term.encode()).hexdigest())
+
+
+def lookup(serial_number):
+    # JSON of the matching machines; unknown numbers are cached as an empty list so that scans stay off the database.
+    term = normalize_serial(serial_number)
+    key = _key(term)
+    machines = cache.get(key)
+    if machines is None:
+        rows = Machine.objects.filter(serial_number_normalized=term).order_by('shipment_date')
+        machines = _renderer.render(MachineLimitedListSerializer(rows, many=True).data)
+        cache.set(key, machines, FOUND_TIMEOUT if machines != b'[]' else NOT_FOUND_TIMEOUT)
+    return machines
+
+
+def invalidate(*serial_numbers):
+    keys = [_key(normalize_serial(serial_number)) for serial_number in serial_numbers if serial_number]
+    if keys:
+        cache.delete_many(keys)
+        # A lookup running inside the writing transaction's window may have cached the old rows again.
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def dictionaries_blob(embed):
+    # The dictionaries part of the response, rendered once per version and shared by every request.
+    version = dictionaries_version(MODEL_DICTIONARIES)
+    if not embed:
+        return _renderer.render({'dictionaries_version': version})[1:-1]
+
+    blob = _blobs.get(version)
+    if blob is None:
+        data, version = load_dictionaries(MODEL_DICTIONARIES)
+        blob = _renderer.render({'dictionaries': data, 'dictionaries_version': version})[1:-1]
+        _blobs.clear()
+        _blobs[version] = blob
+    return blob
+
+
+def render_info(serial_number, embed, permissions):
+    return b''.join((
+        b'{"machines":', lookup(serial_number), b',',
+        dictionaries_blob(embed), b',"permissions":', _renderer.render(permissions), b'}',
+    ))
+
+
+class PublicInfoThrottle(BaseThrottle):
+    # Token bucket per client address, kept as GCRA: bursts up to `capacity`, then `rate` requests per second.
+    # The bucket is read and written under a lock taken with cache.add, so concurrent requests cannot share a token.
+    def __init__(self):
+        self.capacity = settings.PUBLIC_INFO_THROTTLE['capacity']
+        self.rate = settings.PUBLIC_INFO_THROTTLE['rate']
+        self.delay = None
+
+    def allow_request(self, request, view):
+        key = BUCKET_KEY.format(self.get_ident(request))
+        interval = 1 / self.rate
+        tolerance = (self.capacity - 1) * interval
+        for _ in range(LOCK_ATTEMPTS):
+            if cache.add(key + ':lock', 1, LOCK_TIMEOUT):
+                break
+            time.sleep(LOCK_WAIT)
+        else:
+            self.delay = interval
+            return False
+        try:
+            now = time.time()
+            # Theoretical arrival time: when the bucket would be full again.
+            arrival = max(cache.get(key, now), now)
+            if arrival - now > tolerance:
+                self.delay = arrival - now - tolerance
+                return False
+            cache.set(key, arrival + interval, arrival + interval - now)
+            return True
+        finally:
+            cache.delete(key + ':lock')
+
+    def wait(self):
+        return self.delay
@@ -0,0 +1,98 @@
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections, DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_COOKIE = 'primary_reads'
+
+_replica = contextvars.ContextVar('replica_reads', default=False)
+
+
+def wants_replica(request):
+    # A session that has just written keeps reading from the primary until the replica has caught up.
+    return (bool(settings.REPLICA_DATABASE) and request.method in SAFE_METHODS
+            and PRIMARY_COOKIE not in request.COOKIES)
+
+
+@contextmanager
+def replica_reads(request, allowed=True):
+    token = _replica.set(allowed and wants_replica(request))
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+@contextmanager
+def primary_reads():
+    # For reads whose result is cached under a version taken from the primary's side.
+    token = _replica.set(False)
+    try:
+        yield
+    finally:
+        _replica.reset(token)
+
+
+class _ReplicaIterator:
+    # Streaming bodies are read after the view returns, so each chunk is produced under the view's routing.
+    def __init__(self, use_replica, chunks):
+        self.use_replica = use_replica
+        self.chunks = iter(chunks)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _replica.set(self.use_replica)
+        try:
+            return next(self.chunks)
+        finally:
+            _replica.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # Reads inside a transaction must see its own writes.
+        if _replica.get() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return settings.REPLICA_DATABASE
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaReadsMixin:
+    # Actions whose results outlive the replica lag (e.g. cached) read from the primary.
+    primary_actions = ()
+
+    def dispatch(self, request, *args, **kwargs):
+        allowed = self.action_map.get(request.method.lower()) not in self.primary_actions
+        with replica_reads(request, allowed):
+            response = super().dispatch(request, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = _ReplicaIterator(_replica.get(), response.streaming_content)
+        return response
+
+
+def use_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads(request):
+            return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+class ReadYourWritesMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if settings.REPLICA_DATABASE and request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PRIMARY_COOKIE, '1', max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True,
+                                samesite='Lax')
+        return response
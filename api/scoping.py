@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+from .dictionaries import get_versions
+from .models import ServiceCompany
+from .replicas import primary_reads
+
+MANAGER = 'manager'
+SERVICE_COMPANY = 'service_company'
+CLIENT = 'client'
+ANONYMOUS = 'anonymous'
+
+SESSION_KEY = 'api_scope'
+
+Scope = namedtuple('Scope', ['role', 'user_id', 'company_id', 'company_name'])
+
+
+def _service_company_version():
+    return get_versions((ServiceCompany,))[ServiceCompany._meta.label_lower]
+
+
+def _resolve(user):
+    # Kept in the session under the current version, so it must not come from a lagging replica.
+    with primary_reads():
+        service_company = ServiceCompany.objects.filter(service_manager=user).values('id', 'name').first()
+    if service_company:
+        return Scope(SERVICE_COMPANY, user.pk, service_company['id'], service_company['name'])
+    return Scope(CLIENT, user.pk, None, None)
+
+
+def get_scope(request):
+    scope = getattr(request, '_api_scope', None)
+    if scope is not None:
+        return scope
+
+    user = request.user
+    if not user.is_authenticated:
+        scope = Scope(ANONYMOUS, None, None, None)
+    elif user.is_staff:
+        scope = Scope(MANAGER, user.pk, None, None)
+    else:
+        session = getattr(request, 'session', None)
+        use_session = session is not None and session.session_key is not None
+        version = _service_company_version()
+
+        cached = session.get(SESSION_KEY) if use_session else None
+        if cached and cached['user_id'] == user.pk and cached['version'] == version:
+            scope = Scope(cached['role'], user.pk, cached['company_id'], cached['company_name'])
+        else:
+            scope = _resolve(user)
+            if use_session:
+                session[SESSION_KEY] = {'version': version, **scope._asdict()}
+
+    request._api_scope = scope
+    return scope
+
+
+def scope_queryset(queryset, scope, prefix=''):
+    if scope.role == MANAGER:
+        return queryset
+    if scope.role == SERVICE_COMPANY:
+        return queryset.filter(**{f'{prefix}service_company': scope.company_id})
+    if scope.role == CLIENT:
+        return queryset.filter(**{f'{prefix}client': scope.user_id})
+    return queryset.none()
+
+
+class ScopedQuerysetMixin:
+    scope_model = None
+    scope_prefix = ''
+
+    def get_scoped_queryset(self):
+        return scope_queryset(self.scope_model.objects.all(), get_scope(self.request), self.scope_prefix)
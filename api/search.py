@@ -0,0 +1,57 @@
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from .models import normalize_serial
+
+FTS_TABLE = 'api_machine_serial_fts'
+TRIGRAM_LENGTH = 3
+
+_fts_available = {}
+
+
+def fts_available(using):
+    if using not in _fts_available:
+        connection = connections[using]
+        _fts_available[using] = connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+    return _fts_available[using]
+
+
+def _prefix_condition(path, term, using):
+    field = f'{path}serial_number_normalized'
+    if connections[using].vendor == 'sqlite':
+        # SQLite only uses an index for LIKE under NOCASE collation; a range over the
+        # uppercased column is served by the plain b-tree index instead.
+        return {f'{field}__gte': term, f'{field}__lt': term + '\U0010ffff'}
+    return {f'{field}__startswith': term}
+
+
+def _substring_condition(path, term, using):
+    if len(term) >= TRIGRAM_LENGTH and fts_available(using):
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        return {f'{path}id__in': RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE serial MATCH %s', [phrase])}
+    # PostgreSQL serves this LIKE from the pg_trgm index created by migration 0008.
+    return {f'{path}serial_number_normalized__contains': term}
+
+
+def filter_by_serial(queryset, serial_number, prefix=False, path=''):
+    term = normalize_serial(serial_number)
+    if not term:
+        return queryset
+
+    if prefix:
+        return queryset.filter(**_prefix_condition(path, term, queryset.db))
+    return queryset.filter(**_substring_condition(path, term, queryset.db))
+
+
+def index_machine(machine, using):
+    if fts_available(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [machine.pk])
+            cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, serial) VALUES (%s, %s)',
+                           [machine.pk, machine.serial_number_normalized])
+
+
+def unindex_machine(machine, using):
+    if fts_available(using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [machine.pk])
@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import BooleanField, Case, F, QuerySet, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from .models import (
     Machine, Maintenance, Claim, MachineModel, EngineModel, TransmissionModel,
     DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode,
@@ -7,6 +10,78 @@ from .models import (
 )
 
 
+class ValuesListSerializer(serializers.ListSerializer):
+    def _expressions(self):
+        # Fields that live outside the model's table, as ORM expressions to annotate the queryset with.
+        expressions = getattr(self.child, 'expressions', None)
+        return expressions() if expressions else {}
+
+    def _values(self, item, fields, expressions):
+        values = []
+        for field in fields:
+            if field in expressions:
+                serializer_field = self.child.fields[field]
+                values.append(serializer_field.to_representation(serializer_field.get_attribute(item)))
+            else:
+                values.append(getattr(item, field))
+        return values
+
+    def to_representation(self, data):
+        fields = self.child.Meta.fields
+        expressions = self._expressions()
+        if isinstance(data, QuerySet):
+            return list(data.annotate(**expressions).values(*fields))
+        return [dict(zip(fields, self._values(item, fields, expressions))) for item in data]
+
+    def to_columns(self):
+        # Field names once, then one array of values per row.
+        fields = self.child.Meta.fields
+        expressions = self._expressions()
+        if isinstance(self.instance, QuerySet):
+            rows = list(self.instance.annotate(**expressions).values_list(*fields))
+        else:
+            rows = [self._values(item, fields, expressions) for item in self.instance]
+        return {'columns': fields, 'rows': rows}
+
+
+class PreloadedQuerySet:
+    def __init__(self, queryset, objects):
+        self.queryset = queryset
+        self.objects = objects
+
+    def get(self, pk):
+        try:
+            return self.objects[int(pk)]
+        except (KeyError, TypeError, ValueError):
+            return self.queryset.get(pk=pk)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if not isinstance(data, list):
+            return super().to_internal_value(data)
+
+        # Resolve every foreign key of the batch with one query per field instead of one per item.
+        preloaded = {}
+        for name, field in self.child.fields.items():
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.read_only:
+                ids = {item[name] for item in data if isinstance(item, dict) and isinstance(item.get(name), int)}
+                queryset = field.get_queryset()
+                preloaded[field] = field.queryset
+                field.queryset = PreloadedQuerySet(queryset, queryset.in_bulk(ids))
+        try:
+            return super().to_internal_value(data)
+        finally:
+            for field, queryset in preloaded.items():
+                field.queryset = queryset
+
+    def run_child_validation(self, data):
+        if isinstance(self.instance, dict):
+            self.child.instance = self.instance.get(data.get('id'))
+            self.child.initial_data = data
+        return super().run_child_validation(data)
+
+
 class BaseReferenceSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'name', 'description')
@@ -40,6 +115,7 @@ class SteeringAxleModelSerializer(BaseReferenceSerializer):
 class MaintenanceTypeSerializer(BaseReferenceSerializer):
     class Meta(BaseReferenceSerializer.Meta):
         model = MaintenanceType
+        fields = BaseReferenceSerializer.Meta.fields + ('interval_hours',)
 
 
 class FailureNodeSerializer(BaseReferenceSerializer):
@@ -61,7 +137,8 @@ class ServiceCompanySerializer(serializers.ModelSerializer):
 class MachineSerializer(serializers.ModelSerializer):
     class Meta:
         model = Machine
-        fields = '__all__'
+        exclude = ['serial_number_normalized']
+        list_serializer_class = BulkListSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -88,9 +165,17 @@ class MachineListSerializer(serializers.ModelSerializer):
     steering_axle_model_id = serializers.PrimaryKeyRelatedField(source='steering_axle_model', read_only=True)
     service_company_id = serializers.PrimaryKeyRelatedField(source='service_company', read_only=True)
     client_id = serializers.PrimaryKeyRelatedField(source='client', read_only=True)
+    last_maintenance_date = serializers.DateField(source='stats.last_maintenance_date', read_only=True, default=None)
+    last_maintenance_operating_time = serializers.IntegerField(
+        source='stats.last_maintenance_operating_time', read_only=True, default=None
+    )
+    claim_count = serializers.IntegerField(source='stats.claim_count', read_only=True, default=0)
+    total_downtime = serializers.IntegerField(source='stats.total_downtime', read_only=True, default=0)
+    has_open_claims = serializers.SerializerMethodField()
 
     class Meta:
         model = Machine
+        list_serializer_class = ValuesListSerializer
         fields = [
             'id', 'serial_number',
             'model_id',
@@ -100,9 +185,28 @@ class MachineListSerializer(serializers.ModelSerializer):
             'steering_axle_model_id', 'steering_axle_serial_number',
             'shipment_date', 'consignee', 'delivery_address', 'equipment',
             'service_company_id',
-            'client_id'
+            'client_id',
+            'last_maintenance_date', 'last_maintenance_operating_time',
+            'claim_count', 'total_downtime', 'has_open_claims',
+            'version'
         ]
 
+    @staticmethod
+    def expressions():
+        # One LEFT JOIN on MachineStats; machines without maintenances or claims have no row yet.
+        return {
+            'last_maintenance_date': F('stats__last_maintenance_date'),
+            'last_maintenance_operating_time': F('stats__last_maintenance_operating_time'),
+            'claim_count': Coalesce('stats__claim_count', 0),
+            'total_downtime': Coalesce('stats__total_downtime', 0),
+            'has_open_claims': Case(When(stats__last_recovery_date__gt=timezone.localdate(), then=True),
+                                    default=False, output_field=BooleanField()),
+        }
+
+    def get_has_open_claims(self, obj):
+        stats = getattr(obj, 'stats', None)
+        return bool(stats and stats.last_recovery_date and stats.last_recovery_date > timezone.localdate())
+
 
 class MachineLimitedListSerializer(serializers.ModelSerializer):
     model_id = serializers.PrimaryKeyRelatedField(source='model', read_only=True)
@@ -113,6 +217,7 @@ class MachineLimitedListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Machine
+        list_serializer_class = ValuesListSerializer
         fields = [
             'id', 'serial_number',
             'model_id',
@@ -127,6 +232,7 @@ class MaintenanceSerializer(serializers.ModelSerializer):
     class Meta:
         model = Maintenance
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 
 class MaintenanceListSerializer(serializers.ModelSerializer):
@@ -136,12 +242,14 @@ class MaintenanceListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Maintenance
+        list_serializer_class = ValuesListSerializer
         fields = [
             'id', 'machine_id',
             'maintenance_type_id',
             'maintenance_date', 'operating_time',
             'order_number', 'order_date',
-            'organization_id'
+            'organization_id',
+            'version'
         ]
 
 
@@ -149,6 +257,7 @@ class ClaimSerializer(serializers.ModelSerializer):
     class Meta:
         model = Claim
         fields = '__all__'
+        list_serializer_class = BulkListSerializer
 
 
 class ClaimListSerializer(serializers.ModelSerializer):
@@ -158,10 +267,12 @@ class ClaimListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Claim
+        list_serializer_class = ValuesListSerializer
         fields = [
             'id', 'machine_id',
             'failure_date',
             'operating_time', 'failure_node_id',
             'failure_description', 'recovery_method_id',
-            'spare_parts_used', 'recovery_date'
+            'spare_parts_used', 'recovery_date',
+            'version'
         ]
@@ -0,0 +1,159 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import Signal
+
+from . import changes, dictionaries, public, search, stats
+from .models import Machine, Maintenance, Claim, ChangeLog
+
+# Sent after bulk_create/bulk_update, which bypass post_save: instances, created, using.
+bulk_saved = Signal()
+# Sent after bulk deletes, which bypass post_delete: instances, using.
+bulk_deleted = Signal()
+
+
+def _bump_dictionaries(sender, using, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    # A reader that sees the new version rebuilds and caches it, so it must not see it before the rows.
+    transaction.on_commit(lambda: dictionaries.bump(sender), using=using)
+
+
+for _model in dictionaries.TRACKED_MODELS:
+    post_save.connect(_bump_dictionaries, sender=_model, dispatch_uid=f'dictionaries-save-{_model._meta.label_lower}')
+    post_delete.connect(_bump_dictionaries, sender=_model,
+                        dispatch_uid=f'dictionaries-delete-{_model._meta.label_lower}')
+
+
+def _index_machine(sender, instance, using, **kwargs):
+    search.index_machine(instance, using)
+
+
+def _unindex_machine(sender, instance, using, **kwargs):
+    search.unindex_machine(instance, using)
+
+
+def _bulk_bump_dictionaries(sender, using, **kwargs):
+    transaction.on_commit(lambda: dictionaries.bump(sender), using=using)
+
+
+def _bulk_index_machines(sender, instances, using, **kwargs):
+    for instance in instances:
+        search.index_machine(instance, using)
+
+
+def _bulk_unindex_machines(sender, instances, using, **kwargs):
+    for instance in instances:
+        search.unindex_machine(instance, using)
+
+
+for _model in dictionaries.TRACKED_MODELS:
+    bulk_saved.connect(_bulk_bump_dictionaries, sender=_model,
+                       dispatch_uid=f'dictionaries-bulk-{_model._meta.label_lower}')
+
+post_save.connect(_index_machine, sender=Machine, dispatch_uid='search-index-machine')
+post_delete.connect(_unindex_machine, sender=Machine, dispatch_uid='search-unindex-machine')
+bulk_saved.connect(_bulk_index_machines, sender=Machine, dispatch_uid='search-bulk-index-machine')
+bulk_deleted.connect(_bulk_unindex_machines, sender=Machine, dispatch_uid='search-bulk-unindex-machine')
+
+
+def _remember_scope(sender, instance, **kwargs):
+    changes.remember_scope(instance)
+
+
+def _record_save(sender, instance, using, **kwargs):
+    changes.record(sender, [instance], ChangeLog.UPSERT, using)
+
+
+def _record_delete(sender, instance, using, **kwargs):
+    changes.record(sender, [instance], ChangeLog.DELETE, using)
+
+
+def _bulk_record_save(sender, instances, using, **kwargs):
+    changes.record(sender, instances, ChangeLog.UPSERT, using)
+
+
+def _bulk_record_delete(sender, instances, using, **kwargs):
+    changes.record(sender, instances, ChangeLog.DELETE, using)
+
+
+post_init.connect(_remember_scope, sender=Machine, dispatch_uid='changes-init-machine')
+for _model in (Machine, Maintenance, Claim):
+    post_save.connect(_record_save, sender=_model, dispatch_uid=f'changes-save-{_model._meta.label_lower}')
+    post_delete.connect(_record_delete, sender=_model, dispatch_uid=f'changes-delete-{_model._meta.label_lower}')
+    bulk_saved.connect(_bulk_record_save, sender=_model, dispatch_uid=f'changes-bulk-{_model._meta.label_lower}')
+    bulk_deleted.connect(_bulk_record_delete, sender=_model,
+                         dispatch_uid=f'changes-bulk-delete-{_model._meta.label_lower}')
+
+
+def _remember_machine(sender, instance, **kwargs):
+    instance._stats_machine_id = instance.__dict__.get('machine_id')
+
+
+def _refresh_stats(sender, instance, using, **kwargs):
+    stats.refresh({instance.machine_id, getattr(instance, '_stats_machine_id', None)}, using)
+    instance._stats_machine_id = instance.machine_id
+
+
+def _refresh_stats_on_delete(sender, instance, using, origin=None, **kwargs):
+    # The machine itself is being deleted and takes its stats row with it.
+    if isinstance(origin, Machine) or getattr(origin, 'model', None) is Machine:
+        return
+    stats.refresh({instance.machine_id}, using)
+
+
+def _bulk_refresh_stats(sender, instances, using, **kwargs):
+    machine_ids = set()
+    for instance in instances:
+        machine_ids |= {instance.machine_id, getattr(instance, '_stats_machine_id', None)}
+        instance._stats_machine_id = instance.machine_id
+    stats.refresh(machine_ids, using)
+
+
+def _bulk_refresh_stats_on_delete(sender, instances, using, **kwargs):
+    stats.refresh({instance.machine_id for instance in instances}, using)
+
+
+for _model in (Maintenance, Claim):
+    post_init.connect(_remember_machine, sender=_model, dispatch_uid=f'stats-init-{_model._meta.label_lower}')
+    post_save.connect(_refresh_stats, sender=_model, dispatch_uid=f'stats-save-{_model._meta.label_lower}')
+    post_delete.connect(_refresh_stats_on_delete, sender=_model,
+                        dispatch_uid=f'stats-delete-{_model._meta.label_lower}')
+    bulk_saved.connect(_bulk_refresh_stats, sender=_model, dispatch_uid=f'stats-bulk-{_model._meta.label_lower}')
+    bulk_deleted.connect(_bulk_refresh_stats_on_delete, sender=_model,
+                         dispatch_uid=f'stats-bulk-delete-{_model._meta.label_lower}')
+
+
+def _remember_serial(sender, instance, **kwargs):
+    instance._public_serial = instance.__dict__.get('serial_number')
+
+
+def _invalidate_public(sender, instance, **kwargs):
+    public.invalidate(instance.serial_number, getattr(instance, '_public_serial', None))
+    instance._public_serial = instance.serial_number
+
+
+def _bulk_invalidate_public(sender, instances, **kwargs):
+    serial_numbers = set()
+    for instance in instances:
+        serial_numbers |= {instance.serial_number, getattr(instance, '_public_serial', None)}
+        instance._public_serial = instance.serial_number
+    public.invalidate(*serial_numbers)
+
+
+post_init.connect(_remember_serial, sender=Machine, dispatch_uid='public-init-machine')
+post_save.connect(_invalidate_public, sender=Machine, dispatch_uid='public-save-machine')
+post_delete.connect(_invalidate_public, sender=Machine, dispatch_uid='public-delete-machine')
+bulk_saved.connect(_bulk_invalidate_public, sender=Machine, dispatch_uid='public-bulk-machine')
+bulk_deleted.connect(_bulk_invalidate_public, sender=Machine, dispatch_uid='public-bulk-delete-machine')
+
+
+def _configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor == 'sqlite':
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(_configure_sqlite, dispatch_uid='sqlite-pragmas')
@@ -0,0 +1,55 @@
+from django.db.models import Count, Max, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .analytics import DOWNTIME
+from .models import Machine, Maintenance, Claim, MachineStats
+
+BATCH_SIZE = 2000
+
+STATS_FIELDS = ('last_maintenance_date', 'last_maintenance_operating_time', 'maintenance_count', 'claim_count',
+                'total_downtime', 'last_recovery_date')
+
+
+def _per_machine(queryset, **aggregate):
+    return Subquery(queryset.filter(machine=OuterRef('pk')).order_by().values('machine').annotate(**aggregate)
+                    .values(*aggregate))
+
+
+def _stats(machines):
+    last_maintenance = Maintenance.objects.filter(machine=OuterRef('pk')).order_by('-maintenance_date', '-id')
+    rows = machines.annotate(
+        stats_last_maintenance_date=Subquery(last_maintenance.values('maintenance_date')[:1]),
+        stats_last_maintenance_operating_time=Subquery(last_maintenance.values('operating_time')[:1]),
+        stats_maintenance_count=Coalesce(_per_machine(Maintenance.objects, value=Count('id')), 0),
+        stats_claim_count=Coalesce(_per_machine(Claim.objects, value=Count('id')), 0),
+        stats_total_downtime=_per_machine(Claim.objects, value=Sum(DOWNTIME)),
+        stats_last_recovery_date=_per_machine(Claim.objects, value=Max('recovery_date')),
+    ).values_list('pk', *[f'stats_{field}' for field in STATS_FIELDS])
+
+    for pk, last_date, last_time, maintenance_count, claim_count, downtime, last_recovery in rows:
+        yield MachineStats(
+            machine_id=pk,
+            last_maintenance_date=last_date,
+            last_maintenance_operating_time=last_time,
+            maintenance_count=maintenance_count,
+            claim_count=claim_count,
+            total_downtime=downtime.days if downtime else 0,
+            last_recovery_date=last_recovery,
+        )
+
+
+def refresh(machine_ids, using='default'):
+    machine_ids = {pk for pk in machine_ids if pk is not None}
+    if not machine_ids:
+        return
+    stats = list(_stats(Machine.objects.using(using).filter(pk__in=machine_ids)))
+    MachineStats.objects.using(using).bulk_create(
+        stats, update_conflicts=True, unique_fields=['machine'], update_fields=STATS_FIELDS
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE, using='default'):
+    ids = list(Machine.objects.using(using).order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        refresh(ids[start:start + batch_size], using)
+    return len(ids)
@@ -0,0 +1,199 @@
+import datetime
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User, Group, Permission
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Machine, Maintenance, Claim, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
+    DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod, normalize_serial
+from .signals import bulk_saved
+
+BATCH_SIZE = 2000
+
+# Maintenance type -> interval in operating hours; the run-in service is done once, so it has none.
+MAINTENANCE_INTERVALS = {
+    'ТО-0 (50 м/час)': None,
+    'ТО-1 (200 м/час)': 200,
+    'ТО-2 (400 м/час)': 400,
+    'ТО-4 (1000 м/час)': 1000,
+    'ТО-5 (2000 м/час)': 2000,
+}
+
+REFERENCE_NAMES = {
+    MachineModel: ['ПД1,5', 'ПД2,0', 'ПД3,0', 'ПД5,0', 'ПГ1,5'],
+    EngineModel: ['ММЗ Д-243', 'ММЗ Д-245', 'Kubota V3300', 'Kubota V2403'],
+    TransmissionModel: ['10VA-00105', '20VA-00102', '30VA-00103'],
+    DriveAxleModel: ['10VB-00106', '20VB-00108', '30VB-00109'],
+    SteeringAxleModel: ['VS20-00001', 'VS30-00002', 'VS50-00003'],
+    MaintenanceType: list(MAINTENANCE_INTERVALS),
+    FailureNode: ['Двигатель', 'Трансмиссия', 'Ведущий мост', 'Управляемый мост', 'Гидросистема'],
+    RecoveryMethod: ['Ремонт узла', 'Замена узла', 'Регулировка'],
+}
+
+# Group name -> default permissions (model, actions) when the group does not exist yet.
+GROUPS = {
+    'Менеджер': {'machine': 'view add change delete', 'maintenance': 'view add change delete',
+                 'claim': 'view add change delete'},
+    'Сервисная организация': {'machine': 'view', 'maintenance': 'view add change', 'claim': 'view add change'},
+    'Клиент': {'machine': 'view', 'maintenance': 'view add change', 'claim': 'view'},
+}
+
+
+def _group(name):
+    group, created = Group.objects.get_or_create(name=name)
+    if created:
+        codenames = [f'{action}_{model}' for model, actions in GROUPS[name].items() for action in actions.split()]
+        group.permissions.set(Permission.objects.filter(content_type__app_label='api', codename__in=codenames))
+    return group
+
+
+def _reference(model, name):
+    if model is MaintenanceType:
+        return model(name=name, interval_hours=MAINTENANCE_INTERVALS[name])
+    return model(name=name)
+
+
+def _references(model):
+    ids = list(model.objects.values_list('id', flat=True))
+    if not ids:
+        created = model.objects.bulk_create([_reference(model, name) for name in REFERENCE_NAMES[model]])
+        bulk_saved.send(sender=model, instances=created, created=True, using=model.objects.db)
+        ids = [instance.pk for instance in created]
+    return ids
+
+
+def _save(model, instances, batch_size):
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+            bulk_saved.send(sender=model, instances=batch, created=True, using=model.objects.db)
+
+
+class FleetGenerator:
+    def __init__(self, prefix='SYN', password='password', seed=None, batch_size=BATCH_SIZE, years=5):
+        self.prefix = prefix
+        self.password = make_password(password)
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.today = timezone.localdate()
+        self.years = years
+
+    def users(self, kind, count):
+        users = [
+            User(username=f'{self.prefix.lower()}_{kind}_{number}', password=self.password,
+                 first_name=f'{kind.capitalize()} {number}')
+            for number in range(1, count + 1)
+        ]
+        _save(User, users, self.batch_size)
+        return users
+
+    def service_companies(self, count):
+        managers = self.users('service', count)
+        companies = [
+            ServiceCompany(name=f'{self.prefix} Сервис {number}', service_manager=manager)
+            for number, manager in enumerate(managers, 1)
+        ]
+        _save(ServiceCompany, companies, self.batch_size)
+        _group('Сервисная организация').user_set.add(*managers)
+        return companies
+
+    def clients(self, count):
+        clients = self.users('client', count)
+        _group('Клиент').user_set.add(*clients)
+        return clients
+
+    def machines(self, count, companies, clients):
+        references = {model: _references(model) for model in (
+            MachineModel, EngineModel, TransmissionModel, DriveAxleModel, SteeringAxleModel)}
+        pick = self.random.choice
+        machines = []
+        for number in range(1, count + 1):
+            serial_number = f'{self.prefix}{number:07d}'
+            machines.append(Machine(
+                serial_number=serial_number,
+                serial_number_normalized=normalize_serial(serial_number),
+                model_id=pick(references[MachineModel]),
+                engine_model_id=pick(references[EngineModel]),
+                engine_serial_number=f'E{number:07d}',
+                transmission_model_id=pick(references[TransmissionModel]),
+                transmission_serial_number=f'T{number:07d}',
+                drive_axle_model_id=pick(references[DriveAxleModel]),
+                drive_axle_serial_number=f'D{number:07d}',
+                steering_axle_model_id=pick(references[SteeringAxleModel]),
+                steering_axle_serial_number=f'S{number:07d}',
+                contract_info=f'Договор №{number} от {self.today.year}',
+                shipment_date=self.today - datetime.timedelta(days=self.random.randint(30, 365 * self.years)),
+                consignee=f'Грузополучатель {self.random.randint(1, 500)}',
+                delivery_address=f'г. Город-{self.random.randint(1, 100)}, ул. Заводская, {number}',
+                equipment='Стандарт',
+                client=pick(clients),
+                service_company=pick(companies),
+            ))
+        _save(Machine, machines, self.batch_size)
+        return machines
+
+    def _events(self, machine, count):
+        # Dates after shipment with operating hours growing at the machine's own daily rate.
+        span = (self.today - machine.shipment_date).days
+        rate = self.random.uniform(2, 16)
+        for day in sorted(self.random.randint(1, span) for _ in range(count)):
+            yield machine.shipment_date + datetime.timedelta(days=day), round(day * rate)
+
+    def _spread(self, machines, total):
+        counts = [0] * len(machines)
+        for _ in range(total):
+            counts[self.random.randrange(len(machines))] += 1
+        return zip(machines, counts)
+
+    def maintenances(self, machines, total):
+        types = _references(MaintenanceType)
+        maintenances = []
+        for machine, count in self._spread(machines, total):
+            for date, hours in self._events(machine, count):
+                maintenances.append(Maintenance(
+                    machine=machine,
+                    maintenance_type_id=self.random.choice(types),
+                    maintenance_date=date,
+                    operating_time=hours,
+                    order_number=f'ЗН-{machine.pk}-{len(maintenances)}',
+                    order_date=date,
+                    organization_id=None if self.random.random() < 0.2 else machine.service_company_id,
+                    service_company_id=machine.service_company_id,
+                ))
+        _save(Maintenance, maintenances, self.batch_size)
+        return maintenances
+
+    def claims(self, machines, total):
+        nodes = _references(FailureNode)
+        methods = _references(RecoveryMethod)
+        claims = []
+        for machine, count in self._spread(machines, total):
+            for date, hours in self._events(machine, count):
+                claims.append(Claim(
+                    machine=machine,
+                    failure_date=date,
+                    operating_time=hours,
+                    failure_node_id=self.random.choice(nodes),
+                    failure_description='Синтетический отказ',
+                    recovery_method_id=self.random.choice(methods),
+                    spare_parts_used='',
+                    recovery_date=min(date + datetime.timedelta(days=self.random.randint(0, 30)), self.today),
+                    service_company_id=machine.service_company_id,
+                ))
+        _save(Claim, claims, self.batch_size)
+        return claims
+
+    def run(self, machines, maintenances, claims, service_companies, clients):
+        companies = self.service_companies(service_companies)
+        client_users = self.clients(clients)
+        fleet = self.machines(machines, companies, client_users)
+        return {
+            'service_companies': len(companies),
+            'clients': len(client_users),
+            'machines': len(fleet),
+            'maintenances': len(self.maintenances(fleet, maintenances)) if fleet else 0,
+            'claims': len(self.claims(fleet, claims)) if fleet else 0,
+        }
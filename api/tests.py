@@ -1,3 +1,910 @@
-from django.test import TestCase
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth.models import User, Permission
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from . import changes, events, public, renderers
+from .forecast import MAX_DAYS
+from .dictionaries import DATA_KEY, get_versions, load_dictionaries
+from .metrics import QueryBudgetExceeded, registry
+from .replicas import PRIMARY_COOKIE, ReplicaRouter, replica_reads
+from .scoping import CLIENT, MANAGER, SERVICE_COMPANY, Scope, get_scope
+from .serializers import ValuesListSerializer
+from .synthetic import FleetGenerator
+from .models import Machine, Maintenance, Claim, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
+    DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod, MachineStats, ChangeLog
+
+
+@override_settings(QUERY_BUDGETS_STRICT=True)
+class FleetTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.staff = User.objects.create_user('manager', is_staff=True)
+        self.staff.user_permissions.set(Permission.objects.filter(content_type__app_label='api'))
+        self.client.force_authenticate(self.staff)
+
+        self.references = {
+            model: model.objects.create(name=model.__name__)
+            for model in (MachineModel, EngineModel, TransmissionModel, DriveAxleModel, SteeringAxleModel,
+                          MaintenanceType, FailureNode, RecoveryMethod)
+        }
+        self.count = 0
+
+    def add_machines(self, count):
+        machines = []
+        for _ in range(count):
+            self.count += 1
+            manager = User.objects.create_user(f'service{self.count}')
+            service_company = ServiceCompany.objects.create(name=f'Сервис {self.count}', service_manager=manager)
+            client = User.objects.create_user(f'client{self.count}', first_name=f'Клиент {self.count}')
+            machine = Machine.objects.create(
+                serial_number=f'{self.count:04d}',
+                model=self.references[MachineModel],
+                engine_model=self.references[EngineModel],
+                engine_serial_number='E',
+                transmission_model=self.references[TransmissionModel],
+                transmission_serial_number='T',
+                drive_axle_model=self.references[DriveAxleModel],
+                drive_axle_serial_number='D',
+                steering_axle_model=self.references[SteeringAxleModel],
+                steering_axle_serial_number='S',
+                shipment_date=datetime.date(2024, 1, 1),
+                consignee='Грузополучатель',
+                delivery_address='Адрес',
+                client=client,
+                service_company=service_company,
+            )
+            Maintenance.objects.create(
+                machine=machine,
+                maintenance_type=self.references[MaintenanceType],
+                maintenance_date=datetime.date(2024, 2, 1),
+                operating_time=100,
+                order_number='1',
+                order_date=datetime.date(2024, 2, 1),
+                service_company=service_company,
+            )
+            Claim.objects.create(
+                machine=machine,
+                failure_date=datetime.date(2024, 3, 1),
+                operating_time=150,
+                failure_node=self.references[FailureNode],
+                failure_description='Отказ',
+                recovery_method=self.references[RecoveryMethod],
+                recovery_date=datetime.date(2024, 3, 4),
+                service_company=service_company,
+            )
+            machines.append(machine)
+        return machines
+
+
+class DictionaryCacheTest(FleetTestCase):
+    def test_version_changes_only_after_commit(self):
+        label = MachineModel._meta.label_lower
+        before = get_versions((MachineModel,))[label]
+        self.client.get('/api/dictionaries/')
+        with self.captureOnCommitCallbacks(execute=True):
+            MachineModel.objects.create(name='Новая модель')
+            self.assertEqual(get_versions((MachineModel,))[label], before)
+            self.assertNotIn('Новая модель', str(self.client.get('/api/dictionaries/').json()))
+        self.assertNotEqual(get_versions((MachineModel,))[label], before)
+        self.assertIn('Новая модель', str(self.client.get('/api/dictionaries/').json()))
+
+    def test_rebuild_replaces_the_cached_entry(self):
+        machine = self.add_machines(1)[0]
+        load_dictionaries(('machines',))
+        stamp = cache.get(DATA_KEY.format('machines'))[0]
+
+        machine.serial_number = 'НОВЫЙ'
+        with self.captureOnCommitCallbacks(execute=True):
+            machine.save()
+        data, _ = load_dictionaries(('machines',))
+        self.assertEqual(data['machines'][0]['serial_number'], 'НОВЫЙ')
+        self.assertNotEqual(cache.get(DATA_KEY.format('machines'))[0], stamp)
+        self.assertEqual(cache.get(DATA_KEY.format('machines'))[1], data['machines'])
+
+
+class DictionariesEndpointTest(FleetTestCase):
+    def test_if_none_match_is_answered_without_queries(self):
+        response = self.client.get('/api/dictionaries/')
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        etag = response['ETag']
+        self.assertEqual(etag, f'"{response.json()["dictionaries_version"]}"')
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.get('/api/dictionaries/', HTTP_IF_NONE_MATCH=f'W/{etag}')
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(statements, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            MachineModel.objects.create(name='Новая модель')
+        self.assertEqual(self.client.get('/api/dictionaries/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_versioned_url_is_immutable(self):
+        version = self.client.get('/api/dictionaries/').json()['dictionaries_version']
+        response = self.client.get('/api/dictionaries/', {'v': version})
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        response = self.client.get('/api/dictionaries/', {'v': 'old'})
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+
+    def test_lists_can_leave_dictionaries_out(self):
+        self.add_machines(1)
+        full = self.client.get('/api/machines/').json()
+        data = self.client.get('/api/machines/', {'dictionaries': '0'}).json()
+        self.assertNotIn('dictionaries', data)
+        self.assertEqual(data['dictionaries_version'], full['dictionaries_version'])
+        self.assertEqual(data['machines'], full['machines'])
+
+class ListQueryCountTest(FleetTestCase):
+    def count_queries(self, url):
+        cache.clear()
+        self.client.force_authenticate(User.objects.get(pk=self.staff.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_row_count(self):
+        for url in ('/api/machines/', '/api/maintenances/', '/api/claims/'):
+            with self.subTest(url=url):
+                self.add_machines(2)
+                small = self.count_queries(url)
+                self.add_machines(10)
+                self.assertEqual(self.count_queries(url), small)
+
+
+class MetricsTest(FleetTestCase):
+    def test_server_timing_and_metrics(self):
+        registry.clear()
+        self.add_machines(2)
+        response = self.client.get('/api/machines/')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", app;dur=')
+
+        self.client.force_login(self.staff)
+        metrics = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('silant_http_requests_total{endpoint="machine-list",method="GET",status="200"} 1', metrics)
+
+    def test_serializer_work_is_timed_as_serialize(self):
+        self.add_machines(2)
+        to_representation = ValuesListSerializer.to_representation
+
+        def slow(serializer, data):
+            time.sleep(0.05)
+            return to_representation(serializer, data)
+
+        for url in ('/api/machines/', '/api/async/machines/'):
+            with self.subTest(url=url), mock.patch.object(ValuesListSerializer, 'to_representation', slow):
+                timing = self.client.get(url)['Server-Timing']
+                self.assertGreaterEqual(float(re.search(r'serialize;dur=([\d.]+)', timing).group(1)), 50)
+
+    def test_server_timing_is_for_staff_only(self):
+        self.add_machines(1)
+        client = APIClient()
+        response = client.get('/api/machines/public_info/', {'serial_number': '0001'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Server-Timing'))
+
+        client.force_authenticate(User.objects.get(username='client1'))
+        self.assertFalse(client.get('/api/machines/').has_header('Server-Timing'))
+
+        with self.settings(DEBUG=True):
+            self.assertTrue(client.get('/api/machines/').has_header('Server-Timing'))
+
+    @override_settings(QUERY_BUDGETS={'machine-list': 1}, QUERY_BUDGETS_STRICT=True)
+    def test_query_budget(self):
+        self.add_machines(1)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/machines/')
+
+
+class BulkTest(FleetTestCase):
+    def machine_data(self, machine, serial_number):
+        return {
+            'serial_number': serial_number, 'model': machine.model_id, 'engine_model': machine.engine_model_id,
+            'engine_serial_number': 'E', 'transmission_model': machine.transmission_model_id,
+            'transmission_serial_number': 'T', 'drive_axle_model': machine.drive_axle_model_id,
+            'drive_axle_serial_number': 'D', 'steering_axle_model': machine.steering_axle_model_id,
+            'steering_axle_serial_number': 'S', 'shipment_date': '2024-05-01', 'consignee': 'К',
+            'delivery_address': 'А', 'client': machine.client_id, 'service_company': machine.service_company_id,
+        }
+
+    def test_bulk_created_machines_are_searchable(self):
+        machine = self.add_machines(1)[0]
+        items = [self.machine_data(machine, ' ab-123 '), self.machine_data(machine, 'AB-456')]
+        response = self.client.post('/api/machines/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        for term, expected in (('AB-123', ['AB-123']), ('ab-', ['AB-123', 'AB-456'])):
+            with self.subTest(term=term):
+                found = self.client.get('/api/machines/', {'serial_number': term}).json()['machines']
+                self.assertEqual(sorted(machine['serial_number'].strip().upper() for machine in found), expected)
+
+    def test_bulk_update_checks_versions(self):
+        first, second = self.add_machines(2)
+        items = [{'id': first.pk, 'version': 1, 'consignee': 'Новый'}, {'id': second.pk, 'consignee': 'Новый'}]
+        response = self.client.patch('/api/machines/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['version'] for result in response.json()['results']], [2, 2])
+
+        response = self.client.patch('/api/machines/bulk/', {'items': items[:1]}, format='json')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response.json()['results'][0]['version'], 2)
+
+    def test_bulk_update_accepts_string_ids(self):
+        machine = self.add_machines(1)[0]
+        items = [{'id': str(machine.pk), 'serial_number': machine.serial_number, 'consignee': 'Новый'}]
+        response = self.client.patch('/api/machines/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Machine.objects.get().consignee, 'Новый')
+
+
+    def test_bulk_create_rejects_malformed_machine_ids(self):
+        machine = self.add_machines(1)[0]
+        item = {'maintenance_type': self.references[MaintenanceType].pk, 'maintenance_date': '2024-06-01',
+                'operating_time': 300, 'order_number': '5', 'order_date': '2024-06-01'}
+        items = [{**item, 'machine': value} for value in (str(machine.pk), 'abc', [1], {}, True)]
+        response = self.client.post('/api/maintenances/bulk/', {'items': items}, format='json')
+        self.assertEqual(response.status_code, 400)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 424)
+        self.assertEqual([result['status'] for result in results[1:]], [400] * 4)
+        self.assertTrue(all('machine' in result['errors'] for result in results[1:]))
+
+        response = self.client.post('/api/maintenances/bulk/', {'items': items[:1]}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Maintenance.objects.get(operating_time=300).service_company, machine.service_company)
+
+    def delete(self, resource, ids):
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            response = self.client.delete(f'/api/{resource}/bulk/', {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response, len(statements)
+
+    def test_bulk_delete_runs_a_fixed_number_of_queries(self):
+        machines = self.add_machines(12)
+        claims = list(Claim.objects.order_by('id').values_list('id', flat=True))
+        self.delete('claims', [0])
+        _, few = self.delete('claims', claims[:2])
+        response, many = self.delete('claims', claims[2:] + [0])
+        self.assertEqual(few, many)
+        self.assertEqual([result['status'] for result in response.json()['results']], [204] * 10 + [404])
+
+        self.assertFalse(Claim.objects.exists())
+        self.assertEqual(set(MachineStats.objects.values_list('claim_count', 'total_downtime')), {(0, 0)})
+        tombstones = ChangeLog.objects.filter(table='claim', action=ChangeLog.DELETE)
+        self.assertEqual(set(tombstones.values_list('object_id', 'service_company_id')),
+                         {(pk, machine.service_company_id) for pk, machine in zip(claims, machines)})
+
+    def test_bulk_delete_of_machines_takes_their_history(self):
+        machine, other = self.add_machines(2)
+        maintenance = Maintenance.objects.get(machine=machine)
+        self.delete('machines', [machine.pk])
+
+        self.assertEqual(list(Machine.objects.all()), [other])
+        self.assertEqual(list(MachineStats.objects.values_list('machine', flat=True)), [other.pk])
+        self.assertEqual(Maintenance.objects.count() + Claim.objects.count(), 2)
+        tombstone = ChangeLog.objects.get(table='maintenance', object_id=maintenance.pk, action=ChangeLog.DELETE)
+        self.assertEqual(tombstone.client_id, machine.client_id)
+        self.assertEqual(self.client.get('/api/machines/public_info/', {'serial_number': '0001'}).json()['machines'],
+                         [])
+
+class MachineStatsTest(FleetTestCase):
+    def stats(self, machine):
+        return MachineStats.objects.values(
+            'last_maintenance_date', 'last_maintenance_operating_time', 'maintenance_count', 'claim_count',
+            'total_downtime', 'last_recovery_date',
+        ).get(machine=machine)
+
+    def test_stats_follow_maintenances_and_claims(self):
+        machine, other = self.add_machines(2)
+        self.assertEqual(self.stats(machine), {
+            'last_maintenance_date': datetime.date(2024, 2, 1), 'last_maintenance_operating_time': 100,
+            'maintenance_count': 1, 'claim_count': 1, 'total_downtime': 3,
+            'last_recovery_date': datetime.date(2024, 3, 4),
+        })
+
+        maintenance = Maintenance.objects.create(
+            machine=machine, maintenance_type=self.references[MaintenanceType],
+            maintenance_date=datetime.date(2024, 6, 1), operating_time=400, order_number='2',
+            order_date=datetime.date(2024, 6, 1),
+            service_company=machine.service_company,
+        )
+        claim = Claim.objects.get(machine=machine)
+        claim.recovery_date = datetime.date(2024, 3, 11)
+        claim.save()
+        stats = self.stats(machine)
+        self.assertEqual((stats['last_maintenance_operating_time'], stats['maintenance_count']), (400, 2))
+        self.assertEqual((stats['total_downtime'], stats['last_recovery_date']), (10, datetime.date(2024, 3, 11)))
+
+        # Moving a row to another machine updates both.
+        maintenance.machine = other
+        maintenance.save()
+        claim.machine = other
+        claim.save()
+        self.assertEqual(self.stats(machine), {
+            'last_maintenance_date': datetime.date(2024, 2, 1), 'last_maintenance_operating_time': 100,
+            'maintenance_count': 1, 'claim_count': 0, 'total_downtime': 0, 'last_recovery_date': None,
+        })
+        stats = self.stats(other)
+        self.assertEqual((stats['maintenance_count'], stats['claim_count'], stats['total_downtime']), (2, 2, 13))
+
+        maintenance.delete()
+        claim.delete()
+        stats = self.stats(other)
+        self.assertEqual((stats['last_maintenance_operating_time'], stats['maintenance_count']), (100, 1))
+        self.assertEqual((stats['claim_count'], stats['total_downtime']), (1, 3))
+
+    def test_stats_after_bulk_delete(self):
+        machine = self.add_machines(1)[0]
+        ids = list(Maintenance.objects.values_list('id', flat=True))
+        self.client.delete('/api/maintenances/bulk/', {'ids': ids}, format='json')
+        stats = self.stats(machine)
+        self.assertEqual((stats['maintenance_count'], stats['last_maintenance_date']), (0, None))
+        self.assertEqual(stats['claim_count'], 1)
+
+class GridTest(FleetTestCase):
+    def rows(self, filter_model):
+        return self.client.get('/api/maintenances/rows/', {'filterModel': json.dumps(filter_model)})
+
+    def test_filters_are_coerced_to_column_types(self):
+        first, second = self.add_machines(2)
+        Maintenance.objects.filter(machine=second).update(operating_time=300)
+        for filter_model, expected in (
+            ({'operatingTime': {'filterType': 'number', 'type': 'greaterThan', 'filter': '200'}}, [second]),
+            ({'machineId': {'filterType': 'set', 'values': [str(first.pk)]}}, [first]),
+            ({'machineId': {'filterType': 'text', 'type': 'equals', 'filter': '0002'}}, [second]),
+        ):
+            with self.subTest(filter_model=filter_model):
+                response = self.rows(filter_model)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([row['machine_id'] for row in response.json()['rowData']],
+                                 [machine.pk for machine in expected])
+
+    def test_invalid_filter_values_are_rejected(self):
+        self.add_machines(1)
+        for filter_model in (
+            {'operatingTime': {'filterType': 'number', 'type': 'equals', 'filter': 'abc'}},
+            {'operatingTime': {'filterType': 'number', 'type': 'inRange', 'filter': 1, 'filterTo': [2]}},
+            {'machineId': {'filterType': 'set', 'values': ['SN-0001']}},
+            {'machineId': {'filterType': 'set', 'values': 'abc'}},
+            {'orderNumber': {'filterType': 'text', 'type': 'contains', 'filter': None}},
+            {'maintenanceDate': {'filterType': 'date', 'type': 'equals', 'dateFrom': 'вчера'}},
+        ):
+            with self.subTest(filter_model=filter_model):
+                response = self.rows(filter_model)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+
+class PublicInfoTest(FleetTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(None)
+
+    def lookup(self, serial_number, address='10.0.0.1', **headers):
+        return self.client.get('/api/machines/public_info/', {'serial_number': serial_number},
+                               REMOTE_ADDR=address, **headers)
+
+    def test_lookup_is_cached_and_invalidated_on_save(self):
+        machine = self.add_machines(1)[0]
+        self.assertEqual(self.lookup('0001').json()['machines'][0]['serial_number'], '0001')
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            self.assertEqual(len(self.lookup(' 0001 ').json()['machines']), 1)
+        self.assertFalse([sql for sql in statements if '"api_machine"' in sql])
+
+        machine.serial_number = '0002X'
+        machine.save()
+        self.assertEqual(self.lookup('0001').json()['machines'], [])
+        self.assertEqual(len(self.lookup('0002x').json()['machines']), 1)
+
+    @override_settings(PUBLIC_INFO_THROTTLE={'capacity': 2, 'rate': 1 / 60})
+    def test_throttle_is_keyed_on_the_client_address(self):
+        self.add_machines(1)
+        self.assertEqual([self.lookup('0001').status_code for _ in range(2)], [200, 200])
+        self.assertEqual(self.lookup('0001').status_code, 429)
+        self.assertEqual(self.lookup('0001', HTTP_X_FORWARDED_FOR='192.0.2.7').status_code, 429)
+        self.assertEqual(self.lookup('0001', address='10.0.0.2').status_code, 200)
+
+    @override_settings(PUBLIC_INFO_THROTTLE={'capacity': 3, 'rate': 1 / 60})
+    def test_throttle_refills_one_token_at_a_time(self):
+        self.add_machines(1)
+        started = 1_000_000_000.0
+
+        def lookups(seconds, count):
+            with mock.patch('api.public.time.time', return_value=started + seconds):
+                return [self.lookup('0001') for _ in range(count)]
+
+        self.assertEqual([response.status_code for response in lookups(0, 4)], [200, 200, 200, 429])
+        # A fixed window would start afresh at the minute boundary 20 seconds later.
+        self.assertEqual([response.status_code for response in lookups(30, 3)], [429, 429, 429])
+        responses = lookups(60, 2)
+        self.assertEqual([response.status_code for response in responses], [200, 429])
+        self.assertEqual(responses[1]['Retry-After'], '60')
+
+    def test_throttle_waits_for_a_concurrent_request(self):
+        self.add_machines(1)
+        cache.add(public.BUCKET_KEY.format('10.0.0.9') + ':lock', 1, 60)
+        with mock.patch.object(public, 'LOCK_WAIT', 0):
+            self.assertEqual(self.lookup('0001', address='10.0.0.9').status_code, 429)
+        cache.delete(public.BUCKET_KEY.format('10.0.0.9') + ':lock')
+        self.assertEqual(self.lookup('0001', address='10.0.0.9').status_code, 200)
+
+
+class ChangesTest(FleetTestCase):
+    def changes(self, user, since):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client.get('/api/changes/', {'since': since}).json()
+
+    def test_ownership_transfer_moves_history(self):
+        machine, other = self.add_machines(2)
+        maintenance, claim = Maintenance.objects.get(machine=machine), Claim.objects.get(machine=machine)
+        previous, current = machine.service_company.service_manager, other.service_company.service_manager
+        since = self.client.get('/api/changes/').json()['version']
+
+        machine.service_company = other.service_company
+        machine.save()
+
+        changes = self.changes(previous, since)['changes']
+        self.assertEqual(changes['machines']['deletes'], [machine.id])
+        self.assertEqual(changes['maintenances']['deletes'], [maintenance.id])
+        self.assertEqual(changes['claims']['deletes'], [claim.id])
+
+        changes = self.changes(current, since)['changes']
+        self.assertEqual([row['id'] for row in changes['machines']['upserts']], [machine.id])
+        self.assertEqual([row['id'] for row in changes['maintenances']['upserts']], [maintenance.id])
+        self.assertEqual([row['id'] for row in changes['claims']['upserts']], [claim.id])
+        self.assertEqual(changes['maintenances']['deletes'], [])
+
+        changes = self.changes(self.staff, since)['changes']
+        self.assertEqual([row['id'] for row in changes['maintenances']['upserts']], [maintenance.id])
+        self.assertEqual(changes['maintenances']['deletes'], [])
+
+    def test_since_must_be_an_integer(self):
+        response = self.client.get('/api/changes/', {'since': 'abc'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('error', response.json())
+
+
+    def test_change_log_writes_are_serialized_on_postgresql(self):
+        machine = self.add_machines(1)[0]
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            if sql.startswith('LOCK TABLE'):
+                return None
+            return execute(sql, params, many, context)
+
+        with mock.patch.object(connection, 'vendor', 'postgresql'), connection.execute_wrapper(record):
+            changes.record(Machine, [machine], ChangeLog.UPSERT, 'default')
+        lock = statements.index('LOCK TABLE api_changelog IN SHARE ROW EXCLUSIVE MODE')
+        self.assertTrue(statements[lock + 1].startswith('INSERT INTO "api_changelog"'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SQLite has a single writer')
+class ChangeOrderTest(TransactionTestCase):
+    def test_interleaved_writers_do_not_skip_versions(self):
+        # A takes an id and commits late; B writes meanwhile. A reader that saw B must still get A.
+        entry = {'table': 'machine', 'action': ChangeLog.UPSERT, 'service_company_id': None, 'client_id': None}
+        a_recorded, a_release, b_done = threading.Event(), threading.Event(), threading.Event()
+
+        def write(object_id, recorded=None, release=None, done=None):
+            try:
+                with transaction.atomic():
+                    changes._serialize_writes('default')
+                    ChangeLog.objects.create(object_id=object_id, **entry)
+                    if recorded:
+                        recorded.set()
+                        release.wait(5)
+                if done:
+                    done.set()
+            finally:
+                connection.close()
+
+        a = threading.Thread(target=write, args=(1, a_recorded, a_release))
+        a.start()
+        a_recorded.wait(5)
+        b = threading.Thread(target=write, args=(2,), kwargs={'done': b_done})
+        b.start()
+        b_done.wait(0.5)
+        seen = changes.latest_version()
+        a_release.set()
+        a.join()
+        b.join()
+
+        scope = Scope(MANAGER, None, None, None)
+        self.assertIn(1, changes.collect(scope, seen)['changes']['machines']['deletes'])
+
+class CompressionTest(FleetTestCase):
+    def test_responses_are_padded_against_breach(self):
+        self.add_machines(10)
+        bodies = [self.client.get('/api/machines/', HTTP_ACCEPT_ENCODING='gzip, br').content for _ in range(20)]
+        self.assertTrue(all(body[3] & gzip.FNAME for body in bodies))
+        self.assertEqual(len({gzip.decompress(body) for body in bodies}), 1)
+        self.assertGreater(len(set(bodies)), 1)
+
+        response = self.client.get('/api/machines/', HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+
+class PaginationTest(FleetTestCase):
+    def test_cursor_walks_every_row_once(self):
+        machines = self.add_machines(5)
+        ids, params = [], {'page_size': 2}
+        while True:
+            data = self.client.get('/api/machines/', params).json()
+            ids += [row['id'] for row in data['machines']]
+            if not data['next_cursor']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(ids, [machine.id for machine in machines])
+
+        self.assertEqual(self.client.get('/api/machines/', {'cursor': 'broken'}).status_code, 404)
+
+
+class SearchTest(FleetTestCase):
+    def serials(self, **params):
+        return sorted(row['serial_number'] for row in self.client.get('/api/machines/', params).json()['machines'])
+
+    def test_serial_number_search(self):
+        self.add_machines(12)
+        self.assertEqual(self.serials(serial_number='001', serial_match='prefix'), ['0010', '0011', '0012'])
+        self.assertEqual(self.serials(serial_number=' 011'), ['0011'])
+        self.assertEqual(self.serials(serial_number='01'), ['0001', '0010', '0011', '0012'])
+        maintenances = self.client.get('/api/maintenances/', {'serial_number': '0012'}).json()['maintenances']
+        self.assertEqual([row['machine_id'] for row in maintenances], [Machine.objects.get(serial_number='0012').id])
+
+
+class ScopeTest(FleetTestCase):
+    def test_owners_see_only_their_machines(self):
+        machine, other = self.add_machines(2)
+        client = APIClient()
+        for user in (machine.client, machine.service_company.service_manager):
+            user.user_permissions.set(Permission.objects.filter(codename='view_machine'))
+            client.force_authenticate(user)
+            self.assertEqual([row['id'] for row in client.get('/api/machines/').json()['machines']], [machine.id])
+            self.assertEqual(client.get(f'/api/machines/{other.serial_number}/detail/').status_code, 404)
+
+    def test_session_scope_follows_company_changes(self):
+        company = self.add_machines(1)[0].service_company
+        client = APIClient()
+        client.force_login(company.service_manager)
+        self.assertEqual(client.get('/api/auth/user/info/').json()['userType'], 'service_company')
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            info = client.get('/api/auth/user/info/').json()
+        self.assertEqual((info['userType'], info['organizationName']), ('service_company', 'Сервис 1'))
+        self.assertFalse([sql for sql in statements if '"api_servicecompany"' in sql])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            company.name = 'Сервис Плюс'
+            company.save()
+        self.assertEqual(client.get('/api/auth/user/info/').json()['organizationName'], 'Сервис Плюс')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            company.service_manager = None
+            company.save()
+        self.assertEqual(client.get('/api/auth/user/info/').json()['userType'], 'client')
+
+
+class FullDetailTest(FleetTestCase):
+    def test_full_detail(self):
+        machine = self.add_machines(1)[0]
+        data = self.client.get(f'/api/machines/{machine.serial_number}/detail/').json()
+        self.assertEqual(data['machine']['id'], machine.id)
+        self.assertEqual(data['machine']['claim_count'], 1)
+        self.assertEqual(data['machine']['total_downtime'], 3)
+        self.assertEqual(data['machine']['last_maintenance_operating_time'], 100)
+        self.assertEqual([row['operating_time'] for row in data['maintenances']], [100])
+        self.assertEqual([row['operating_time'] for row in data['claims']], [150])
+
+
+class ExportTest(FleetTestCase):
+    def export(self, resource, file_format):
+        response = self.client.get(f'/api/{resource}/export/', {'file_format': file_format})
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        self.add_machines(2)
+        lines = self.export('claims', 'csv').decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[0].endswith(';Время простоя техники'))
+        self.assertTrue(lines[1].startswith('0001;2024-03-01;150;FailureNode;'))
+        self.assertTrue(lines[1].endswith(';Сервис 1;3'))
+        self.assertEqual(self.client.get('/api/claims/export/', {'file_format': 'pdf'}).status_code, 400)
+
+
+class ImportTest(FleetTestCase):
+    def upload(self, resource, name, content):
+        return self.client.post(f'/api/{resource}/import/', {'file': SimpleUploadedFile(name, content)},
+                                format='multipart')
+
+    def test_exported_files_import_back(self):
+        self.add_machines(2)
+        for file_format in ('csv', 'xlsx'):
+            response = self.client.get('/api/maintenances/export/', {'file_format': file_format})
+            content = b''.join(response.streaming_content)
+            Maintenance.objects.all().delete()
+            response = self.upload('maintenances', f'maintenances.{file_format}', content)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual((response.json()['created'], response.json()['rejected']), (2, 0))
+            self.assertEqual(sorted(Maintenance.objects.values_list('machine__serial_number', 'operating_time')),
+                             [('0001', 100), ('0002', 100)])
+
+    def test_rejected_rows_are_reported(self):
+        machine = self.add_machines(1)[0]
+        content = '\n'.join((
+            'machine;maintenance_type;maintenance_date;operating_time;order_number;order_date',
+            f'{machine.serial_number};MaintenanceType;01.04.2024;300;2;01.04.2024',
+            'нет такой;MaintenanceType;01.04.2024;300;3;01.04.2024',
+            f'{machine.serial_number};Неизвестный;01.04.2024;300;4;01.04.2024',
+        )).encode()
+        report = self.upload('maintenances', 'maintenances.csv', content).json()
+        self.assertEqual((report['rows'], report['created'], report['rejected']), (3, 1, 2))
+        self.assertEqual([reject['line'] for reject in report['rejects']], [3, 4])
+        self.assertEqual(Maintenance.objects.get(operating_time=300).service_company, machine.service_company)
+
+        self.assertEqual(self.upload('maintenances', 'maintenances.xlsx', b'not a zip').status_code, 400)
+
+
+class AnalyticsTest(FleetTestCase):
+    def test_groups_and_validation(self):
+        self.add_machines(3)
+        data = self.client.get('/api/analytics/', {'group_by': 'service_company'}).json()
+        self.assertEqual([(group['failures'], group['downtime_total']) for group in data['groups']], [(1, 3)] * 3)
+
+        data = self.client.get('/api/analytics/', {'group_by': 'month'}).json()
+        self.assertEqual([(group['key'], group['failures']) for group in data['groups']], [('2024-03', 3)])
+
+        self.assertEqual(self.client.get('/api/analytics/', {'group_by': 'colour'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/analytics/', {'date_from': '01.03.2024'}).status_code, 400)
+
+
+class EventsTest(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(events, '_broker', events.LocalBroker())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def event(self, version, service_company_id=1, client_id=2):
+        return {'version': version, 'table': 'machines', 'id': version, 'action': 'upsert',
+                'service_company_id': service_company_id, 'client_id': client_id}
+
+    async def test_events_reach_only_their_scope(self):
+        broker = events.get_broker()
+        manager = broker.subscribe(Scope(MANAGER, 1, None, None))
+        company = broker.subscribe(Scope(SERVICE_COMPANY, 5, 1, 'Сервис'))
+        client = broker.subscribe(Scope(CLIENT, 3, None, None))
+        broker.publish([self.event(1), self.event(2, service_company_id=7, client_id=3)])
+        await asyncio.sleep(0)
+
+        self.assertEqual(manager.queue.qsize(), 2)
+        self.assertEqual(company.queue.get_nowait()['version'], 1)
+        self.assertTrue(company.queue.empty())
+        self.assertEqual(client.queue.get_nowait()['version'], 2)
+        self.assertTrue(client.queue.empty())
+
+    async def test_overflow_turns_into_one_resync(self):
+        broker = events.get_broker()
+        with mock.patch.object(events, 'QUEUE_SIZE', 2):
+            subscription = broker.subscribe(Scope(MANAGER, 1, None, None))
+        broker.publish([self.event(version) for version in range(1, 6)])
+        await asyncio.sleep(0)
+        self.assertTrue(subscription.overflowed)
+
+        messages = events.stream(subscription)
+        self.assertIn('event: resync', await anext(messages))
+        self.assertEqual(await anext(messages), 'event: resync\ndata: {}\n\n')
+        self.assertTrue(subscription.queue.empty())
+        await messages.aclose()
+
+    async def test_stream_ends_and_unsubscribes(self):
+        broker = events.get_broker()
+        subscription = broker.subscribe(Scope(MANAGER, 1, None, None))
+        broker.publish([self.event(1)])
+        await asyncio.sleep(0)
+
+        messages = [message async for message in events.stream(subscription, seconds=0.05)]
+        self.assertIn('id: 1\nevent: change', messages[1])
+        self.assertEqual(messages[2:], [': keep-alive\n\n'])
+        self.assertEqual(broker.subscriptions, set())
+
+        subscription = broker.subscribe(Scope(MANAGER, 1, None, None))
+        messages = events.stream(subscription)
+        await anext(messages)
+        await messages.aclose()
+        self.assertEqual(broker.subscriptions, set())
+
+
+class EventsEndpointTest(FleetTestCase):
+    def test_wsgi_requests_are_not_streamed(self):
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/api/events/').status_code, 204)
+        self.assertIs(self.client.get('/api/auth/user/info/').json()['liveUpdates'], False)
+
+
+class RendererTest(FleetTestCase):
+    def test_responses_are_rendered_with_orjson(self):
+        machine = self.add_machines(1)[0]
+        with mock.patch.object(renderers.orjson, 'dumps', wraps=renderers.orjson.dumps) as dumps:
+            for url in ('/api/machines/', f'/api/machines/{machine.pk}/'):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('Грузополучатель'.encode(), response.content)
+        self.assertEqual(dumps.call_count, 2)
+
+    def test_ascii_output_falls_back_to_drf(self):
+        renderer = renderers.FastJSONRenderer()
+        renderer.ensure_ascii = True
+        rendered = renderer.render({'name': 'Сервис'})
+        self.assertEqual(rendered, b'{"name":"\\u0421\\u0435\\u0440\\u0432\\u0438\\u0441"}')
+
+
+class RowVersionTest(FleetTestCase):
+    def test_detail_etag_and_if_match(self):
+        self.add_machines(1)
+        machine = Machine.objects.get()
+        url = f'/api/machines/{machine.pk}/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        response = self.client.patch(url, {'consignee': 'Новый'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response = self.client.patch(url, {'consignee': 'Старый'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        machine.refresh_from_db()
+        self.assertEqual((machine.consignee, machine.version), ('Новый', 2))
+
+
+class AsyncReadPathTest(FleetTestCase):
+    def test_async_read_path_matches_sync(self):
+        self.add_machines(3)
+        machine = Machine.objects.first()
+        for url in ('machines/', 'maintenances/', 'claims/', 'machines/?limit=2', f'machines/{machine.pk}/',
+                    'dictionaries/', 'auth/user/info/'):
+            async_url = '/api/async/' + url.removeprefix('auth/')
+            self.assertEqual(self.client.get(async_url).json(), self.client.get('/api/' + url).json())
+
+        url = f'/api/async/machines/{machine.pk}/'
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=self.client.get(url)['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/api/async/parts/').status_code, 404)
+
+    def test_async_user_info_for_non_staff(self):
+        machine = self.add_machines(1)[0]
+        for user in (machine.client, machine.service_company.service_manager):
+            with self.subTest(user=user.username):
+                self.client.force_authenticate(user)
+                response = self.client.get('/api/async/user/info/')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), self.client.get('/api/auth/user/info/').json())
+
+
+class SyntheticFleetTest(TestCase):
+    def test_generated_fleet_exercises_the_forecast(self):
+        counts = FleetGenerator(seed=1).run(machines=20, maintenances=60, claims=20, service_companies=2, clients=5)
+        self.assertEqual(counts, {'service_companies': 2, 'clients': 5, 'machines': 20, 'maintenances': 60,
+                                  'claims': 20})
+        self.assertEqual(Machine.objects.exclude(serial_number_normalized='').count(), 20)
+
+        staff = User.objects.create_user('manager', is_staff=True)
+        staff.user_permissions.set(Permission.objects.filter(content_type__app_label='api'))
+        client = APIClient()
+        client.force_authenticate(staff)
+        response = client.get('/api/forecast/', {'days': MAX_DAYS})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()['items'])
+
+
+class DatabaseProfileTest(TransactionTestCase):
+    def test_sqlite_connection_is_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        statements = []
+
+        def record(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(record):
+            with transaction.atomic():
+                Machine.objects.exists()
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+
+    @skipUnless('DJANGO_DB_NAME' not in os.environ, 'Another database is configured')
+    def test_committed_database_keeps_rollback_journal(self):
+        # Bytes 18-19 of the header are 2, 2 once a file has been switched to WAL.
+        database = settings.BASE_DIR / 'db.sqlite3'
+        header = database.read_bytes()[:20]
+        alias = 'committed'
+        connections.settings[alias] = {**connections.settings['default'], 'NAME': str(database)}
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'delete')
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+        self.assertEqual(database.read_bytes()[:20], header)
+        self.assertEqual(header[18:20], b'\x01\x01')
+
+
+@override_settings(REPLICA_DATABASE='replica')
+class ReplicaRouterTest(TransactionTestCase):
+    def test_safe_requests_read_from_replica(self):
+        router, factory = ReplicaRouter(), RequestFactory()
+        self.assertEqual(router.db_for_read(Machine), 'default')
+
+        with replica_reads(factory.get('/api/machines/')):
+            self.assertEqual(router.db_for_read(Machine), 'replica')
+            self.assertEqual(router.db_for_write(Machine), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(Machine), 'default')
+
+        written = factory.get('/api/machines/', HTTP_COOKIE=f'{PRIMARY_COOKIE}=1')
+        for request in (factory.post('/api/machines/'), written):
+            with replica_reads(request):
+                self.assertEqual(router.db_for_read(Machine), 'default')
+
+    def test_cached_reads_stay_on_primary(self):
+        # The replica alias does not exist here, so any read routed to it would fail.
+        manager = User.objects.create_user('service')
+        ServiceCompany.objects.create(name='Сервис', service_manager=manager)
+        request = RequestFactory().get('/api/machines/')
+        request.user = manager
+        with replica_reads(request):
+            dictionaries, _ = load_dictionaries(('service_companies',))
+            self.assertEqual([company['name'] for company in dictionaries['service_companies']], ['Сервис'])
+            self.assertEqual(get_scope(request).company_name, 'Сервис')
+
+
+@override_settings(REPLICA_DATABASE='default')
+class ReadYourWritesTest(FleetTestCase):
+    def test_write_pins_session_to_primary(self):
+        url = f'/api/machines/{self.add_machines(1)[0].pk}/'
+        self.assertNotIn(PRIMARY_COOKIE, self.client.get(url).cookies)
+        self.assertIn(PRIMARY_COOKIE, self.client.patch(url, {'consignee': 'Новый'}, format='json').cookies)
@@ -1,10 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from api import async_views
+from api.events import events
+from api.metrics import metrics
 from api.views import (
-    user_info, MachineViewSet, MaintenanceViewSet, ClaimViewSet, MachineModelViewSet, EngineModelViewSet,
-    TransmissionModelViewSet, DriveAxleModelViewSet, SteeringAxleModelViewSet, MaintenanceTypeViewSet,
-    FailureNodeViewSet, RecoveryMethodViewSet, ServiceCompanyViewSet
+    user_info, dictionaries, changes, analytics, forecast, MachineViewSet, MaintenanceViewSet, ClaimViewSet,
+    MachineModelViewSet, EngineModelViewSet, TransmissionModelViewSet, DriveAxleModelViewSet, SteeringAxleModelViewSet,
+    MaintenanceTypeViewSet, FailureNodeViewSet, RecoveryMethodViewSet, ServiceCompanyViewSet
 )
 
 router = DefaultRouter()
@@ -23,6 +26,16 @@ router.register(r'claims', ClaimViewSet, basename='claim')
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('dictionaries/', dictionaries, name='dictionaries'),
+    path('changes/', changes, name='changes'),
+    path('events/', events, name='events'),
+    path('analytics/', analytics, name='analytics'),
+    path('forecast/', forecast, name='forecast'),
+    path('metrics/', metrics, name='metrics'),
+    path('async/dictionaries/', async_views.dictionaries, name='async-dictionaries'),
+    path('async/user/info/', async_views.user_info, name='async-user-info'),
+    path('async/<str:resource>/', async_views.resource_list, name='async-list'),
+    path('async/<str:resource>/<int:pk>/', async_views.resource_detail, name='async-detail'),
     path('auth/', include('dj_rest_auth.urls')),
     path('auth/registration/', include('dj_rest_auth.registration.urls')),
     path('auth/user/info/', user_info, name='user-info'),
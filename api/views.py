@@ -1,54 +1,177 @@
-from django.db.models import Case, When, Value, IntegerField
-from django.contrib.auth.models import User
+import datetime
+
+from django.db.models import Prefetch
+from django.http import HttpResponse
 from django.shortcuts import render
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import status
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, DjangoModelPermissions, AllowAny
 from rest_framework.response import Response
 from rest_framework.viewsets import ReadOnlyModelViewSet, ModelViewSet
+from .dictionaries import load_dictionaries, dictionaries_version, SHARED_DICTIONARIES, MACHINE_DICTIONARIES, \
+    MAINTENANCE_DICTIONARIES, CLAIM_DICTIONARIES, MACHINE_DETAIL_DICTIONARIES
+from .pagination import KeysetPagination
+from .public import PublicInfoThrottle, render_info
+from .replicas import ReplicaReadsMixin, use_replica
+from .search import filter_by_serial
+from .scoping import ScopedQuerysetMixin, get_scope, SERVICE_COMPANY
+from .analytics import fleet_analytics, GROUPS
+from .bulk import BulkMixin
+from .conditional import ConditionalMixin
+from .forecast import due_within, MAX_DAYS
+from .changes import collect, latest_version
+from .events import supported as events_supported
+from .metrics import serializing
+from .exports import ExportMixin, MachineExport, MaintenanceExport, ClaimExport
+from .imports import ImportMixin, MachineImport, MaintenanceImport, ClaimImport
+from .grid import ServerSideRowModelMixin, MACHINE_COLUMNS, MAINTENANCE_COLUMNS, CLAIM_COLUMNS
 from .models import Machine, Maintenance, Claim, ServiceCompany, MachineModel, EngineModel, TransmissionModel, \
     DriveAxleModel, SteeringAxleModel, MaintenanceType, FailureNode, RecoveryMethod
 from .serializers import MachineSerializer, MachineListSerializer, MachineLimitedListSerializer, MaintenanceSerializer, \
     MaintenanceListSerializer, ClaimSerializer, ClaimListSerializer, MachineModelSerializer, \
     EngineModelSerializer, TransmissionModelSerializer, DriveAxleModelSerializer, SteeringAxleModelSerializer, \
-    MaintenanceTypeSerializer, FailureNodeSerializer, RecoveryMethodSerializer, UserSerializer, \
-    ServiceCompanySerializer
+    MaintenanceTypeSerializer, FailureNodeSerializer, RecoveryMethodSerializer, ServiceCompanySerializer
 
 
 def homepage(request, id=None):
     return render(request, 'index.html')
 
 
+def embed_dictionaries(request, names):
+    if request.query_params.get('dictionaries') in ('0', 'false'):
+        return {'dictionaries_version': dictionaries_version(names)}
+
+    data, version = load_dictionaries(names)
+    return {'dictionaries': data, 'dictionaries_version': version}
+
+
+def model_permissions(user, model):
+    return {
+        'can_create': user.has_perm(f'api.add_{model}'),
+        'can_edit': user.has_perm(f'api.change_{model}'),
+        'can_delete': user.has_perm(f'api.delete_{model}'),
+    }
+
+
+def serialize_rows(request, serializer_class, rows):
+    serializer = serializer_class(rows, many=True)
+    with serializing(request):
+        if request.query_params.get('shape') == 'columns':
+            return serializer.to_columns()
+        return serializer.data
+
+
+def dictionaries_not_modified(request, version):
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in if_none_match or quote_etag(version) in [tag.removeprefix('W/') for tag in if_none_match]
+
+
+def dictionaries_headers(request, response, version):
+    response['ETag'] = quote_etag(version)
+    if request.query_params.get('v') == version:
+        response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    else:
+        response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def user_info(request):
-    user = request.user
+def dictionaries(request):
+    version = dictionaries_version(SHARED_DICTIONARIES)
+
+    if dictionaries_not_modified(request, version):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        data, version = load_dictionaries(SHARED_DICTIONARIES)
+        response = Response({'dictionaries': data, 'dictionaries_version': version})
+
+    return dictionaries_headers(request, response, version)
+
 
-    if user.is_staff:
-        user_type = 'manager'
-        return Response({
-            'username': user.username,
-            'userType': user_type,
-            'organizationName': user.first_name or user.username
-        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def changes(request):
+    since = request.query_params.get('since')
+    if since is None:
+        return Response({'version': latest_version()})
+
+    try:
+        since = int(since)
+    except ValueError:
+        return Response({"error": "Параметр since должен быть целым числом"}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(collect(get_scope(request), since))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def analytics(request):
+    group_by = request.query_params.get('group_by', 'failure_node')
+    if group_by not in GROUPS:
+        return Response(
+            {"error": f"Недопустимая группировка: {group_by}. Доступны: {', '.join(GROUPS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    dates = {}
+    for param in ('date_from', 'date_to'):
+        value = request.query_params.get(param)
+        if value:
+            try:
+                dates[param] = datetime.date.fromisoformat(value)
+            except ValueError:
+                return Response({"error": f"Неверный формат даты {param}: {value}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'group_by': group_by,
+        'groups': fleet_analytics(get_scope(request), group_by, **dates),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@use_replica
+def forecast(request):
+    try:
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        days = -1
+    if not 0 <= days <= MAX_DAYS:
+        return Response({"error": f"Параметр days должен быть целым числом от 0 до {MAX_DAYS}"},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({'days': days, 'items': due_within(get_scope(request), days)})
 
-    service_company = ServiceCompany.objects.filter(service_manager=user).first()
 
-    if service_company:
-        user_type = 'service_company'
-        organization_name = service_company.name
+def user_info_data(request):
+    user = request.user
+    scope = get_scope(request)
+
+    if scope.role == SERVICE_COMPANY:
+        organization_name = scope.company_name
     else:
-        user_type = 'client'
         organization_name = user.first_name or user.username
 
-    return Response({
+    return {
         'username': user.username,
-        'userType': user_type,
-        'organizationName': organization_name
-    })
+        'userType': scope.role,
+        'organizationName': organization_name,
+        'liveUpdates': events_supported(request),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_info(request):
+    return Response(user_info_data(request))
 
 
-class BaseReferenceViewSet(ReadOnlyModelViewSet):
+class BaseReferenceViewSet(ReplicaReadsMixin, ReadOnlyModelViewSet):
     permission_classes = [AllowAny]
 
 
@@ -109,10 +232,19 @@ class CustomDjangoPermission(DjangoModelPermissions):
     }
 
 
-class MachineViewSet(ModelViewSet):
+class MachineViewSet(ReplicaReadsMixin, ConditionalMixin, ScopedQuerysetMixin, ServerSideRowModelMixin, ExportMixin,
+                     ImportMixin, BulkMixin, ModelViewSet):
     serializer_class = MachineSerializer
-
-    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    list_serializer_class = MachineListSerializer
+    grid_columns = MACHINE_COLUMNS
+    export_class = MachineExport
+    import_class = MachineImport
+    pagination_class = KeysetPagination
+    keyset_field = 'shipment_date'
+    scope_model = Machine
+    primary_actions = ('public_info',)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny], throttle_classes=[PublicInfoThrottle])
     def public_info(self, request):
         serial_number = request.query_params.get('serial_number', None)
         if not serial_number:
@@ -121,91 +253,75 @@ class MachineViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        try:
-            machines = MachineLimitedListSerializer(
-                Machine.objects.filter(serial_number=serial_number).order_by('shipment_date'), many=True).data
-            dictionaries = {
-                'models': MachineModelSerializer(MachineModel.objects.all().order_by('name'), many=True).data,
-                'engine_models': EngineModelSerializer(EngineModel.objects.all().order_by('name'), many=True).data,
-                'transmission_models': TransmissionModelSerializer(TransmissionModel.objects.all().order_by('name'),
-                                                                   many=True).data,
-                'drive_axle_models': DriveAxleModelSerializer(DriveAxleModel.objects.all().order_by('name'),
-                                                              many=True).data,
-                'steering_axle_models': SteeringAxleModelSerializer(SteeringAxleModel.objects.all().order_by('name'),
-                                                                    many=True).data,
-            }
-
-            permissions = {
-                'can_create': request.user.has_perm('machines.add_machine'),
-                'can_edit': request.user.has_perm('machines.change_machine'),
-                'can_delete': request.user.has_perm('machines.delete_machine'),
-            }
-
-            return Response({
-                'machines': machines,
-                'dictionaries': dictionaries,
-                'permissions': permissions
-            })
-
-        except Machine.DoesNotExist:
+        permissions = {
+            'can_create': request.user.has_perm('machines.add_machine'),
+            'can_edit': request.user.has_perm('machines.change_machine'),
+            'can_delete': request.user.has_perm('machines.delete_machine'),
+        }
+        embed = request.query_params.get('dictionaries') not in ('0', 'false')
+        return HttpResponse(render_info(serial_number, embed, permissions), content_type='application/json')
+
+    @action(detail=False, methods=['get'], url_path=r'(?P<serial_number>[^/]+)/detail', url_name='full-detail')
+    def full_detail(self, request, serial_number=None):
+        machine = self.get_scoped_queryset().filter(serial_number=serial_number).select_related(
+            'stats'
+        ).prefetch_related(
+            Prefetch('maintenances', queryset=Maintenance.objects.order_by('maintenance_date', 'id')),
+            Prefetch('claims', queryset=Claim.objects.order_by('failure_date', 'id')),
+        ).first()
+
+        if machine is None:
             return Response(
                 {"error": f"Машина с заводским номером {serial_number} не найдена"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        data = {
+            **embed_dictionaries(request, MACHINE_DETAIL_DICTIONARIES),
+            'permissions': {
+                model: model_permissions(request.user, model) for model in ('machine', 'maintenance', 'claim')
+            }
+        }
+        with serializing(request):
+            data.update({
+                'machine': MachineListSerializer(machine).data,
+                'maintenances': MaintenanceListSerializer(list(machine.maintenances.all()), many=True).data,
+                'claims': ClaimListSerializer(list(machine.claims.all()), many=True).data,
+            })
+            if 'dictionaries' in data:
+                data['dictionaries'] = {
+                    **data['dictionaries'],
+                    'machines': [MachineLimitedListSerializer(machine).data]
+                }
+
+        return Response(data)
+
     def get_queryset(self):
-        user = self.request.user
+        queryset = self.get_scoped_queryset()
         serial_number = self.request.query_params.get('serial_number', None)
 
-        if not user.is_authenticated:
-            queryset = Machine.objects.none()
-        elif user.is_staff:
-            queryset = Machine.objects.all()
-        else:
-            service_company = ServiceCompany.objects.filter(service_manager=user).first()
-            if service_company:
-                queryset = Machine.objects.filter(service_company=service_company)
-            else:
-                queryset = Machine.objects.filter(client=user)
-
         if serial_number:
-            queryset = queryset.filter(serial_number__icontains=serial_number)
+            prefix = self.request.query_params.get('serial_match') == 'prefix'
+            queryset = filter_by_serial(queryset, serial_number, prefix=prefix)
 
-        return queryset.order_by('shipment_date')
+        return queryset.select_related('stats').order_by('shipment_date')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        machines = MachineListSerializer(queryset, many=True).data
-
-        dictionaries = {
-            'models': MachineModelSerializer(MachineModel.objects.all().order_by('name'), many=True).data,
-            'engine_models': EngineModelSerializer(EngineModel.objects.all().order_by('name'), many=True).data,
-            'transmission_models': TransmissionModelSerializer(TransmissionModel.objects.all().order_by('name'),
-                                                               many=True).data,
-            'drive_axle_models': DriveAxleModelSerializer(DriveAxleModel.objects.all().order_by('name'),
-                                                          many=True).data,
-            'steering_axle_models': SteeringAxleModelSerializer(SteeringAxleModel.objects.all().order_by('name'),
-                                                                many=True).data,
-            'service_companies': ServiceCompanySerializer(ServiceCompany.objects.all().order_by('name'),
-                                                          many=True).data,
-            'clients': UserSerializer(User.objects.annotate(
-                first_name_null=Case(When(first_name='', then=Value(1)), When(first_name__isnull=True, then=Value(1)),
-                                     default=Value(0), output_field=IntegerField())).order_by('first_name_null',
-                                                                                              'first_name', 'username'),
-                                      many=True).data,
-        }
+        page = self.paginate_queryset(queryset)
+        machines = serialize_rows(request, MachineListSerializer, queryset if page is None else page)
 
-        permissions = {
-            'can_create': request.user.has_perm('api.add_machine'),
-            'can_edit': request.user.has_perm('api.change_machine'),
-            'can_delete': request.user.has_perm('api.delete_machine'),
-        }
+        permissions = model_permissions(request.user, 'machine')
 
-        return Response({
+        data = {
             'machines': machines,
-            'dictionaries': dictionaries,
+            **embed_dictionaries(request, MACHINE_DICTIONARIES),
             'permissions': permissions
-        })
+        }
+        if page is not None:
+            data['next_cursor'] = self.paginator.next_cursor
+
+        return Response(data)
 
     def get_permissions(self):
         if self.action == 'public_info':
@@ -213,53 +329,46 @@ class MachineViewSet(ModelViewSet):
         return [IsAuthenticated(), CustomDjangoPermission()]
 
 
-class MaintenanceViewSet(ModelViewSet):
+class MaintenanceViewSet(ReplicaReadsMixin, ConditionalMixin, ScopedQuerysetMixin, ServerSideRowModelMixin, ExportMixin,
+                         ImportMixin, BulkMixin, ModelViewSet):
     serializer_class = MaintenanceSerializer
+    list_serializer_class = MaintenanceListSerializer
+    grid_columns = MAINTENANCE_COLUMNS
+    export_class = MaintenanceExport
+    import_class = MaintenanceImport
+    pagination_class = KeysetPagination
+    keyset_field = 'maintenance_date'
+    scope_model = Maintenance
+    service_company_from_machine = True
+    scope_prefix = 'machine__'
     permission_classes = [IsAuthenticated, CustomDjangoPermission]
 
     def get_queryset(self):
-        user = self.request.user
+        queryset = self.get_scoped_queryset()
         serial_number = self.request.query_params.get('serial_number', None)
 
-        if not user.is_authenticated:
-            queryset = Maintenance.objects.none()
-        elif user.is_staff:
-            queryset = Maintenance.objects.all()
-        else:
-            service_company = ServiceCompany.objects.filter(service_manager=user).first()
-            if service_company:
-                queryset = Maintenance.objects.filter(machine__service_company=service_company)
-            else:
-                queryset = Maintenance.objects.filter(machine__client=user)
-
         if serial_number:
-            queryset = queryset.filter(machine__serial_number__icontains=serial_number)
+            prefix = self.request.query_params.get('serial_match') == 'prefix'
+            queryset = filter_by_serial(queryset, serial_number, prefix=prefix, path='machine__')
 
         return queryset.order_by('maintenance_date')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        maintenances = MaintenanceListSerializer(queryset, many=True).data
-
-        dictionaries = {
-            'machines': MachineLimitedListSerializer(Machine.objects.all().order_by('serial_number'), many=True).data,
-            'maintenance_types': MaintenanceTypeSerializer(MaintenanceType.objects.all().order_by('name'),
-                                                           many=True).data,
-            'organizations': [{'id': None, 'name': Maintenance.SELF_SERVICE}] + ServiceCompanySerializer(
-                ServiceCompany.objects.all().order_by('name'), many=True).data,
-        }
+        page = self.paginate_queryset(queryset)
+        maintenances = serialize_rows(request, MaintenanceListSerializer, queryset if page is None else page)
 
-        permissions = {
-            'can_create': request.user.has_perm('api.add_maintenance'),
-            'can_edit': request.user.has_perm('api.change_maintenance'),
-            'can_delete': request.user.has_perm('api.delete_maintenance'),
-        }
+        permissions = model_permissions(request.user, 'maintenance')
 
-        return Response({
+        data = {
             'maintenances': maintenances,
-            'dictionaries': dictionaries,
+            **embed_dictionaries(request, MAINTENANCE_DICTIONARIES),
             'permissions': permissions
-        })
+        }
+        if page is not None:
+            data['next_cursor'] = self.paginator.next_cursor
+
+        return Response(data)
 
     def create(self, request, *args, **kwargs):
         request_data = request.data.copy()
@@ -277,51 +386,46 @@ class MaintenanceViewSet(ModelViewSet):
         return super().create(request, *args, **kwargs)
 
 
-class ClaimViewSet(ModelViewSet):
+class ClaimViewSet(ReplicaReadsMixin, ConditionalMixin, ScopedQuerysetMixin, ServerSideRowModelMixin, ExportMixin,
+                   ImportMixin, BulkMixin, ModelViewSet):
     serializer_class = ClaimSerializer
+    list_serializer_class = ClaimListSerializer
+    grid_columns = CLAIM_COLUMNS
+    export_class = ClaimExport
+    import_class = ClaimImport
+    pagination_class = KeysetPagination
+    keyset_field = 'failure_date'
+    scope_model = Claim
+    service_company_from_machine = True
+    scope_prefix = 'machine__'
     permission_classes = [IsAuthenticated, CustomDjangoPermission]
 
     def get_queryset(self):
-        user = self.request.user
+        queryset = self.get_scoped_queryset()
         serial_number = self.request.query_params.get('serial_number', None)
 
-        if not user.is_authenticated:
-            queryset = Claim.objects.none()
-        elif user.is_staff:
-            queryset = Claim.objects.all()
-        else:
-            service_company = ServiceCompany.objects.filter(service_manager=user).first()
-            if service_company:
-                queryset = Claim.objects.filter(machine__service_company=service_company)
-            else:
-                queryset = Claim.objects.filter(machine__client=user)
-
         if serial_number:
-            queryset = queryset.filter(machine__serial_number__icontains=serial_number)
+            prefix = self.request.query_params.get('serial_match') == 'prefix'
+            queryset = filter_by_serial(queryset, serial_number, prefix=prefix, path='machine__')
 
         return queryset.order_by('failure_date')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        claims = ClaimListSerializer(queryset, many=True).data
-
-        dictionaries = {
-            'machines': MachineLimitedListSerializer(Machine.objects.all().order_by('serial_number'), many=True).data,
-            'failure_nodes': FailureNodeSerializer(FailureNode.objects.all().order_by('name'), many=True).data,
-            'recovery_methods': RecoveryMethodSerializer(RecoveryMethod.objects.all().order_by('name'), many=True).data,
-        }
+        page = self.paginate_queryset(queryset)
+        claims = serialize_rows(request, ClaimListSerializer, queryset if page is None else page)
 
-        permissions = {
-            'can_create': request.user.has_perm('api.add_claim'),
-            'can_edit': request.user.has_perm('api.change_claim'),
-            'can_delete': request.user.has_perm('api.delete_claim'),
-        }
+        permissions = model_permissions(request.user, 'claim')
 
-        return Response({
+        data = {
             'claims': claims,
-            'dictionaries': dictionaries,
+            **embed_dictionaries(request, CLAIM_DICTIONARIES),
             'permissions': permissions
-        })
+        }
+        if page is not None:
+            data['next_cursor'] = self.paginator.next_cursor
+
+        return Response(data)
 
     def create(self, request, *args, **kwargs):
         request_data = request.data.copy()
@@ -15,45 +15,6 @@ export const MachineDetailPage = () => {
     const [claims, setClaims] = useState<ClaimTableProps | null>(null);
     const {serial_number} = useParams();
 
-    const fetchMachineData = async () => {
-        try {
-            setLoading(true);
-            const data = await fetchData(`/api/machines/?serial_number=${serial_number}`,
-                'Ошибка при получении данных о машинах');
-            setMachines(data);
-        } catch (err) {
-            handleError(err);
-        } finally {
-            setLoading(false);
-        }
-    };
-
-    const fetchMaintenanceData = async () => {
-        try {
-            setLoading(true);
-            const data = await fetchData(`/api/maintenances/?serial_number=${serial_number}`,
-                'Ошибка при получении данных о ТО');
-            setMaintenances(data);
-        } catch (err) {
-            handleError(err);
-        } finally {
-            setLoading(false);
-        }
-    };
-
-    const fetchClaimData = async () => {
-        try {
-            setLoading(true);
-            const data = await fetchData(`/api/claims/?serial_number=${serial_number}`,
-                'Ошибка при получении данных о рекламациях');
-            setClaims(data);
-        } catch (err) {
-            handleError(err);
-        } finally {
-            setLoading(false);
-        }
-    };
-
     const loadData = async () => {
         resetStates();
         setMachines(null);
@@ -63,11 +24,23 @@ export const MachineDetailPage = () => {
         if (isLoggedIn && serial_number) {
             try {
                 setLoading(true);
-                await Promise.all([
-                    fetchMachineData(),
-                    fetchMaintenanceData(),
-                    fetchClaimData()
-                ]);
+                const data = await fetchData(`/api/machines/${encodeURIComponent(serial_number)}/detail/`,
+                    'Ошибка при получении данных о машине');
+                setMachines({
+                    machines: [data.machine],
+                    dictionaries: data.dictionaries,
+                    permissions: data.permissions.machine
+                });
+                setMaintenances({
+                    maintenances: data.maintenances,
+                    dictionaries: data.dictionaries,
+                    permissions: data.permissions.maintenance
+                });
+                setClaims({
+                    claims: data.claims,
+                    dictionaries: data.dictionaries,
+                    permissions: data.permissions.claim
+                });
             } catch (err) {
                 handleError(err);
             } finally {
@@ -4,7 +4,7 @@ import {useAuth} from "./contexts/AuthContext.tsx";
 import {MachineInfoTabs} from './MachineInfoTabs';
 import {Routes, Route} from "react-router-dom";
 import {MachineTableProps, MaintenanceTableProps, ClaimTableProps} from '../types/machine.types';
-import {fetchData} from "../utils/utils.ts";
+import {applyChanges, fetchData} from "../utils/utils.ts";
 import {useLoadingError} from "./contexts/LoadingErrorContext.tsx";
 import LoadingErrorDisplay from "./LoadingErrorDisplay";
 import {MachineDetailPage} from "./MachineDetailPage.tsx";
@@ -22,7 +22,7 @@ const Main = () => {
     const fetchMachineData = async () => {
         try {
             setLoading(true);
-            const data = await fetchData('/api/machines/', 'Ошибка при получении данных о машинах');
+            const data = await fetchData('/api/async/machines/', 'Ошибка при получении данных о машинах');
             setMachines(data);
         } catch (err) {
             handleError(err);
@@ -34,7 +34,7 @@ const Main = () => {
     const fetchMaintenanceData = async () => {
         try {
             setLoading(true);
-            const data = await fetchData('/api/maintenances/', 'Ошибка при получении данных о ТО');
+            const data = await fetchData('/api/async/maintenances/', 'Ошибка при получении данных о ТО');
             setMaintenances(data);
         } catch (err) {
             handleError(err);
@@ -46,7 +46,7 @@ const Main = () => {
     const fetchClaimData = async () => {
         try {
             setLoading(true);
-            const data = await fetchData('/api/claims/', 'Ошибка при получении данных о рекламациях');
+            const data = await fetchData('/api/async/claims/', 'Ошибка при получении данных о рекламациях');
             setClaims(data);
         } catch (err) {
             handleError(err);
@@ -121,6 +121,62 @@ const Main = () => {
         handleLoading();
     }, [isLoggedIn]);
 
+    const liveUpdates = Boolean(userInfo?.liveUpdates);
+
+    useEffect(() => {
+        // Only an ASGI server can keep the event stream open.
+        if (!isLoggedIn || !liveUpdates) {
+            return;
+        }
+
+        let version: number | null = null;
+        let syncing = false;
+        let pending = false;
+
+        const syncChanges = async () => {
+            if (version === null || syncing) {
+                pending = true;
+                return;
+            }
+            syncing = true;
+            try {
+                do {
+                    pending = false;
+                    const data = await fetchData(`/api/changes/?since=${version}`, 'Ошибка при получении изменений');
+                    version = data.version;
+                    setMachines((prev) => prev && {
+                        ...prev,
+                        machines: applyChanges(prev.machines, data.changes.machines)
+                    });
+                    setMaintenances((prev) => prev && {
+                        ...prev,
+                        maintenances: applyChanges(prev.maintenances, data.changes.maintenances)
+                    });
+                    setClaims((prev) => prev && {...prev, claims: applyChanges(prev.claims, data.changes.claims)});
+                    pending = pending || data.has_more;
+                } while (pending);
+            } catch (err) {
+                handleError(err);
+            } finally {
+                syncing = false;
+            }
+        };
+
+        const source = new EventSource('/api/events/');
+        source.addEventListener('change', syncChanges);
+        source.addEventListener('resync', syncChanges);
+        fetchData('/api/changes/', 'Ошибка при получении изменений')
+            .then((data) => {
+                version = data.version;
+                if (pending) {
+                    syncChanges();
+                }
+            })
+            .catch(handleError);
+
+        return () => source.close();
+    }, [isLoggedIn, liveUpdates]);
+
     return (
         <div className="page-container">
             <Routes>
@@ -6,6 +6,7 @@ interface UserInfo {
     username: string;
     userType: 'client' | 'service_company' | 'manager' | null;
     organizationName: string | null;
+    liveUpdates: boolean;
 }
 
 interface AuthContextType {
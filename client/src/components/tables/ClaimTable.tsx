@@ -58,6 +58,7 @@ export const ClaimTable: FC<ClaimTableProps> = ({
             recoveryMethodId: -2,
             sparePartsUsed: '',
             recoveryDate: '',
+            version: 1,
         };
     }
 
@@ -72,6 +73,7 @@ export const ClaimTable: FC<ClaimTableProps> = ({
             recoveryMethodId: claim.recovery_method_id,
             sparePartsUsed: claim.spare_parts_used,
             recoveryDate: claim.recovery_date,
+            version: claim.version,
         }));
         if (permissions.can_create) {
             preparedData.push(createEmptyRow());
@@ -162,7 +164,7 @@ export const ClaimTable: FC<ClaimTableProps> = ({
 
         if (data.id !== -2) {
             const convertedData = convertData(data);
-            updateRow('/api/claims', api, convertedData, oldValue, newValue, handleError);
+            updateRow('/api/claims', api, convertedData, oldValue, newValue, handleError, node);
             return;
         }
 
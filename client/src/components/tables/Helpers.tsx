@@ -185,7 +185,7 @@ export const saveNewRow = async (
 
         const newRecord = await response.json();
 
-        const updatedData = {...node.data, id: newRecord.id};
+        const updatedData = {...node.data, id: newRecord.id, version: newRecord.version};
         node.setData(updatedData);
         api.applyTransaction({
             add: [emptyRow],
@@ -219,26 +219,44 @@ export const updateRow = async (
     data: any,
     newValue: any,
     oldValue: any,
-    handleError: (err: unknown) => void
+    handleError: (err: unknown) => void,
+    node?: any
 ) => {
     if (oldValue === newValue) return;
 
+    const headers: Record<string, string> = {
+        'Content-Type': 'application/json',
+        'X-CSRFToken': getCookie('csrftoken') || '',
+    };
+    const version = node?.data?.version;
+    if (version !== undefined) {
+        headers['If-Match'] = `"${data.id}.${version}"`;
+    }
+
     try {
         const response = await fetch(`${baseUrl}/${data.id}/`, {
             method: 'PATCH',
-            headers: {
-                'Content-Type': 'application/json',
-                'X-CSRFToken': getCookie('csrftoken') || '',
-            },
+            headers,
             body: JSON.stringify(data),
             credentials: 'include'
         });
 
+        if (response.status === 412) {
+            const errorMessage = 'Запись была изменена другим пользователем, обновите страницу';
+            handleError(new Error(errorMessage));
+            return { success: false, error: errorMessage };
+        }
+
         if (!response.ok) {
             const errorMessage = `Ошибка при сохранении: ${response.status}`;
             handleError(new Error(errorMessage));
             return { success: false, error: errorMessage };
         }
+
+        const saved = await response.json();
+        if (node?.data) {
+            node.data.version = saved.version;
+        }
     } catch (error) {
         handleError(error);
         api.stopEditing();
@@ -270,27 +288,24 @@ export const deleteSelectedRows = (
             return true;
         }
 
-        const deletePromises = selectedIds.map(id => {
-            const deleteUrl = `${baseUrl}/${id}/`;
-
-            return fetch(deleteUrl, {
-                method: 'DELETE',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-CSRFToken': getCookie('csrftoken') || '',
-                },
-                credentials: 'include',
-            })
-                .then(response => {
-                    if (!response.ok) {
-                        throw new Error(`Ошибка удаления записи с ID ${id}: ${response.status}`);
-                    }
-                    return id;
-                });
-        });
+        fetch(`${baseUrl}/bulk/`, {
+            method: 'DELETE',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-CSRFToken': getCookie('csrftoken') || '',
+            },
+            body: JSON.stringify({ids: selectedIds}),
+            credentials: 'include',
+        })
+            .then(async response => {
+                if (!response.ok) {
+                    throw new Error(`Ошибка удаления записей: ${response.status}`);
+                }
+                const {results} = await response.json();
+                const successfulIds = results
+                    .filter((result: { status: number }) => result.status === 204)
+                    .map((result: { id: number }) => result.id);
 
-        Promise.all(deletePromises)
-            .then(successfulIds => {
                 api.applyTransaction({
                     remove: selectedNodes
                         .filter(node => successfulIds.includes(node.data.id))
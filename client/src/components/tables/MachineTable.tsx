@@ -66,7 +66,8 @@ export const MachineTable: FC<MachineTableProps> = ({
             consignee: '',
             deliveryAddress: '',
             equipment: '',
-            serviceCompanyId: -2
+            serviceCompanyId: -2,
+            version: 1
         };
     }
 
@@ -95,6 +96,12 @@ export const MachineTable: FC<MachineTableProps> = ({
                     deliveryAddress: machine.delivery_address,
                     equipment: machine.equipment,
                     serviceCompanyId: machine.service_company_id,
+                    lastMaintenanceDate: machine.last_maintenance_date,
+                    lastMaintenanceOperatingTime: machine.last_maintenance_operating_time,
+                    claimCount: machine.claim_count,
+                    totalDowntime: machine.total_downtime,
+                    hasOpenClaims: machine.has_open_claims,
+                    version: machine.version,
                 };
             }
 
@@ -230,7 +237,16 @@ export const MachineTable: FC<MachineTableProps> = ({
                 cols: 25
             }
         },
-        createCompanyColumn('Сервисная компания', 'serviceCompanyId', serviceCompanyOptions, '/service-companies')
+        createCompanyColumn('Сервисная компания', 'serviceCompanyId', serviceCompanyOptions, '/service-companies'),
+        {...createDateColumn('Дата последнего ТО', 'lastMaintenanceDate'), editable: false},
+        {...createSimpleColumn('Наработка на последнем ТО, м/час', 'lastMaintenanceOperatingTime'), editable: false},
+        {...createSimpleColumn('Рекламаций', 'claimCount'), editable: false},
+        {
+            ...createSimpleColumn('Открытые рекламации', 'hasOpenClaims'),
+            editable: false,
+            valueFormatter: (params: any) => params.value ? 'Да' : ''
+        },
+        {...createSimpleColumn('Суммарный простой, дней', 'totalDowntime'), editable: false}
     ], [isAuthenticated, baseColumnDefs, clientOptions, serviceCompanyOptions]);
 
     const columnDefs = useMemo(() =>
@@ -283,7 +299,7 @@ export const MachineTable: FC<MachineTableProps> = ({
 
         if (data.id !== -2) {
             const convertedData = convertData(data);
-            updateRow('/api/machines', api, convertedData, oldValue, newValue, handleError);
+            updateRow('/api/machines', api, convertedData, oldValue, newValue, handleError, node);
             return;
         }
 
@@ -58,6 +58,7 @@ export const MaintenanceTable: FC<MaintenanceTableProps> = ({
             orderNumber: '',
             orderDate: '',
             organizationId: -2,
+            version: 1,
         };
     }
 
@@ -70,7 +71,8 @@ export const MaintenanceTable: FC<MaintenanceTableProps> = ({
             operatingTime: maintenance.operating_time,
             orderNumber: maintenance.order_number,
             orderDate: maintenance.order_date,
-            organizationId: maintenance.organization_id ?? -1
+            organizationId: maintenance.organization_id ?? -1,
+            version: maintenance.version
         }));
         if (permissions.can_create) {
             preparedData.push(createEmptyRow());
@@ -141,7 +143,7 @@ export const MaintenanceTable: FC<MaintenanceTableProps> = ({
 
         if (data.id !== -2) {
             const convertedData = convertData(data);
-            updateRow('/api/maintenances', api, convertedData, oldValue, newValue, handleError);
+            updateRow('/api/maintenances', api, convertedData, oldValue, newValue, handleError, node);
             return;
         }
 
@@ -27,6 +27,12 @@ export interface MachineData {
     delivery_address?: string;
     equipment?: string;
     service_company_id?: number;
+    last_maintenance_date?: string | null;
+    last_maintenance_operating_time?: number | null;
+    claim_count?: number;
+    total_downtime?: number;
+    has_open_claims?: boolean;
+    version?: number;
 }
 
 export interface MachineTableProps {
@@ -53,6 +59,7 @@ export interface MaintenanceData {
     order_number: string;
     order_date: string;
     organization_id?: number;
+    version?: number;
 }
 
 export interface MaintenanceTableProps {
@@ -75,6 +82,7 @@ export interface ClaimData {
     recovery_method_id: number;
     spare_parts_used: string;
     recovery_date: string;
+    version?: number;
     downtime: number;
 }
 
@@ -20,4 +20,14 @@ export const fetchData = async (url: string, errorMessage: string) => {
         throw new Error(errorMessage);
     }
     return await response.json();
-};
\ No newline at end of file
+};
+
+export interface TableChanges<T> {
+    upserts: T[];
+    deletes: number[];
+}
+
+export const applyChanges = <T extends { id?: number }>(rows: T[], changes: TableChanges<T>): T[] => {
+    const removed = new Set([...changes.deletes, ...changes.upserts.map((row) => row.id)]);
+    return [...rows.filter((row) => !removed.has(row.id as number)), ...changes.upserts];
+};
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 import os
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -71,7 +73,10 @@ REST_AUTH = {
 ACCOUNT_ADAPTER = 'api.adapters.DisableRegistrationAccountAdapter'
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',
+    'api.replicas.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'api.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -104,14 +109,124 @@ WSGI_APPLICATION = 'config.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+# DJANGO_DB_ENGINE=postgresql for production; SQLite stays the default for small installs.
+
+DB_ENGINE = os.environ.get('DJANGO_DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DJANGO_DB_NAME', 'silant'),
+            'USER': os.environ.get('DJANGO_DB_USER', ''),
+            'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', ''),
+            'HOST': os.environ.get('DJANGO_DB_HOST', ''),
+            'PORT': os.environ.get('DJANGO_DB_PORT', ''),
+            # Each worker thread keeps its connection between requests and checks it before reuse.
+            'CONN_MAX_AGE': int(os.environ.get('DJANGO_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            # PgBouncer in transaction mode hands out a server connection per transaction, so cursors cannot outlive it.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DJANGO_DB_PGBOUNCER', '') == '1',
+            'OPTIONS': {
+                'connect_timeout': int(os.environ.get('DJANGO_DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'api.backends.sqlite3',
+            'NAME': os.environ.get('DJANGO_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+else:
+    raise ImproperlyConfigured(f'Unknown DJANGO_DB_ENGINE: {DB_ENGINE}')
+
+# Optional read replica for list, export and analytics reads: DJANGO_DB_REPLICA_NAME (SQLite file or PostgreSQL
+# database) and/or DJANGO_DB_REPLICA_HOST/PORT; the rest is taken from the primary.
+
+if os.environ.get('DJANGO_DB_REPLICA_NAME') or os.environ.get('DJANGO_DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': os.environ.get('DJANGO_DB_REPLICA_NAME') or DATABASES['default']['NAME'],
+        'HOST': os.environ.get('DJANGO_DB_REPLICA_HOST') or DATABASES['default'].get('HOST', ''),
+        'PORT': os.environ.get('DJANGO_DB_REPLICA_PORT') or DATABASES['default'].get('PORT', ''),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+
+# After a write, the session reads from the primary for this many seconds (longer than the usual replica lag).
+
+READ_YOUR_WRITES_SECONDS = int(os.environ.get('DJANGO_DB_READ_YOUR_WRITES_SECONDS', 5))
+
+# Applied to every new SQLite connection: in WAL mode readers no longer block the writer, and writers wait for the
+# lock instead of failing with "database is locked". The journal mode is stored in the database file itself, so the
+# demo db.sqlite3 checked into the repository keeps its rollback journal; a database named by DJANGO_DB_NAME gets WAL.
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('DJANGO_SQLITE_JOURNAL_MODE',
+                                   'wal' if 'DJANGO_DB_NAME' in os.environ else 'delete'),
+    'busy_timeout': int(os.environ.get('DJANGO_SQLITE_BUSY_TIMEOUT', 5000)),
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+}
+
 
-DATABASES = {
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Dictionary versions are kept here, so multi-process deployments need a shared backend (Redis, Memcached).
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('DJANGO_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('DJANGO_CACHE_LOCATION', ''),
     }
 }
 
+# Live updates (/api/events/) fan out in-process; set a Redis URL when running several ASGI workers.
+
+EVENTS_REDIS_URL = os.environ.get('DJANGO_EVENTS_REDIS_URL', '')
+
+# Request metrics (/api/metrics/, Prometheus text format) are open to staff and to scrapers sending this bearer token.
+
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN', '')
+
+# SQL queries allowed per request, keyed by URL name. Exceeding a budget logs a warning,
+# or raises QueryBudgetExceeded when strict (as in the test suite) so N+1 regressions fail loudly.
+
+QUERY_BUDGETS = {
+    'machine-list': 20,
+    'machine-rows': 14,
+    'machine-export': 14,
+    'machine-detail': 12,
+    'machine-full-detail': 26,
+    'machine-public-info': 10,
+    'maintenance-list': 16,
+    'maintenance-rows': 12,
+    'maintenance-detail': 12,
+    'claim-list': 16,
+    'claim-rows': 12,
+    'claim-detail': 12,
+    'dictionaries': 16,
+    'user-info': 8,
+    'changes': 8,
+    'analytics': 12,
+    'forecast': 14,
+    'async-list': 20,
+    'async-detail': 12,
+    'async-dictionaries': 16,
+    'async-user-info': 8,
+}
+
+# Anonymous serial number lookups: a burst of `capacity` requests per client address, refilled at `rate` per second.
+
+PUBLIC_INFO_THROTTLE = {'capacity': 30, 'rate': 0.5}
+
+QUERY_BUDGETS_STRICT = os.environ.get('DJANGO_QUERY_BUDGETS_STRICT', '') == '1'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -151,6 +266,17 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [
     BASE_DIR / 'static'
 ]
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# collectstatic writes .gz (and .br when brotli is installed) next to every compressible asset.
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'api.compression.CompressedStaticFilesStorage',
+    },
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -165,4 +291,10 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.DjangoModelPermissions',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    # Client addresses for throttling: REMOTE_ADDR unless this many trusted proxies append to X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('DJANGO_NUM_PROXIES', 0)),
 }
@@ -15,7 +15,8 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+from api.compression import serve_static
 from api.views import homepage
 
 urlpatterns = [
@@ -33,4 +34,5 @@ urlpatterns = [
     path('recovery-methods/<int:id>/', homepage, name='home-recovery-methods'),
     path('service-companies/<int:id>/', homepage, name='home-service-companies'),
     path('api/', include('api.urls')),
+    re_path(r'^static/(?P<path>.+)$', serve_static, name='static'),
 ]
\ No newline at end of file